@@ -7,7 +7,7 @@ import matplotlib.pyplot as plt
 import json
 import threading
 import time
-from datetime import datetime
+from datetime import datetime, timedelta
 import paho.mqtt.client as mqtt
 import ssl  # For IoT Core TLS
 import streamlit_authenticator as stauth  # For customer auth
@@ -17,6 +17,12 @@ src_path = os.path.join(os.path.dirname(__file__), '..', 'src')
 if src_path not in sys.path:
     sys.path.insert(0, src_path)
 
+pipeline_path = os.path.join(os.path.dirname(__file__), '..', 'data_pipeline')
+if pipeline_path not in sys.path:
+    sys.path.insert(0, pipeline_path)
+
+from retention import read_range  # Raw / 1m / 1h history
+from schema import READING_COLUMNS
 from anomaly_detection.detect_anomaly import detect_anomalies  # Import for on-the-fly detection
 from predictive_maintenance.train_predictor import train_predictive_model  # Import for predictions
 
@@ -99,24 +105,38 @@ if 'live_sensor_data' not in st.session_state:
         cursor = conn.cursor()
         cursor.execute("PRAGMA table_info(sensor_data)")
         columns = [col[1] for col in cursor.fetchall()]
-        if 'tenant_id' in columns:
+        if 'temp_C' in columns:
+            # Schema v4: typed readings columns, no JSON parsing needed
+            df = pd.read_sql(f"SELECT timestamp, device, tenant_id, {', '.join(READING_COLUMNS)} FROM sensor_data "
+                             "WHERE tenant_id = ? ORDER BY ts DESC LIMIT 500", conn, params=[tenant_id])
+        elif 'ts' in columns:
+            # Schema v2: tenant_id is backfilled and ts is indexed
+            df = pd.read_sql("SELECT * FROM sensor_data WHERE tenant_id = ? ORDER BY ts DESC LIMIT 500", conn, params=[tenant_id])
+        elif 'tenant_id' in columns:
             df = pd.read_sql("SELECT * FROM sensor_data WHERE tenant_id = ? OR tenant_id IS NULL ORDER BY timestamp DESC LIMIT 500", conn, params=[tenant_id])
         else:
             df = pd.read_sql("SELECT * FROM sensor_data ORDER BY timestamp DESC LIMIT 500", conn)
             df['tenant_id'] = 'default'
         conn.close()
         df["timestamp"] = pd.to_datetime(df["timestamp"])
-        # Parse readings JSON for easier handling
-        parsed_rows = []
-        for _, row in df.iterrows():
-            try:
-                readings = json.loads(row['readings'])
-                parsed_row = row.copy()
-                parsed_row['readings'] = readings  # Keep as dict for flexibility
-                parsed_rows.append(parsed_row)
-            except:
-                pass  # Skip invalid
-        st.session_state.live_sensor_data = pd.DataFrame(parsed_rows).sort_values('timestamp') if parsed_rows else pd.DataFrame()
+        if 'readings' not in df.columns:
+            # Same dict-per-row shape as live MQTT rows, built from the typed columns
+            typed = df[list(READING_COLUMNS)]
+            df['readings'] = [{k: v for k, v in r.items() if pd.notna(v)} for r in typed.to_dict(orient='records')]
+            df = df.drop(columns=list(READING_COLUMNS))
+            st.session_state.live_sensor_data = df.sort_values('timestamp') if not df.empty else pd.DataFrame()
+        else:
+            # Parse readings JSON for easier handling
+            parsed_rows = []
+            for _, row in df.iterrows():
+                try:
+                    readings = json.loads(row['readings'])
+                    parsed_row = row.copy()
+                    parsed_row['readings'] = readings  # Keep as dict for flexibility
+                    parsed_rows.append(parsed_row)
+                except:
+                    pass  # Skip invalid
+            st.session_state.live_sensor_data = pd.DataFrame(parsed_rows).sort_values('timestamp') if parsed_rows else pd.DataFrame()
     except Exception as e:
         st.error(f"DB load error: {e}")
         st.session_state.live_sensor_data = pd.DataFrame()
@@ -342,13 +362,22 @@ elif section == "Live Alerts":
 
 elif section == "Historical Data":
     st.subheader(f"📊 Historical — {selected_device} (Tenant: {tenant_id})")
-    if not device_data.empty:
-        numeric_readings = pd.json_normalize(device_data['readings'])
-        common_cols = [col for col in numeric_readings.columns if col in ['temp_C', 'humidity_percent', 'smoke_ppm', 'moisture_percent']]
+    windows = {"Last 6 hours": 6, "Last 3 days": 72, "Last 30 days": 720}
+    window = st.selectbox("Window", list(windows), index=0)
+    try:
+        conn = sqlite3.connect(DB_PATH)
+        # Picks raw rows or the 1m/1h rollups so long windows stay a few thousand points
+        hist = read_range(conn, tenant_id, selected_device, datetime.now() - timedelta(hours=windows[window]))
+        conn.close()
+    except Exception as e:
+        st.error(f"History load error: {e}")
+        hist = pd.DataFrame()
+    if not hist.empty:
+        common_cols = [col for col in ['temp_C', 'humidity_percent', 'smoke_ppm', 'moisture_percent'] if hist[col].notna().any()]
+        st.caption(f"Resolution: {hist.attrs['resolution']} ({len(hist)} points)")
         if common_cols:
-            chart_data = pd.concat([device_data[['timestamp']], numeric_readings[common_cols]], axis=1)
-            st.line_chart(chart_data.set_index("timestamp")[common_cols])
-        st.dataframe(device_data.describe(include='all').round(2))  # Adjust for mixed types
+            st.line_chart(hist.set_index("timestamp")[common_cols])
+            st.dataframe(hist[common_cols].describe().round(2))
     else:
         st.info("No historical data.")
 
@@ -0,0 +1,242 @@
+import os
+import time
+import queue
+import sqlite3
+import threading
+
+# Tuning knobs (env vars so docker-compose / k8s can override them)
+FLUSH_ROWS = int(os.getenv('INGEST_FLUSH_ROWS', 500))          # Flush once this many rows are buffered
+FLUSH_INTERVAL_MS = int(os.getenv('INGEST_FLUSH_MS', 200))     # ...or once the oldest buffered row is this old
+QUEUE_SIZE = int(os.getenv('INGEST_QUEUE_SIZE', 10000))        # Bounded hand-off queue between MQTT and the writer
+STATS_INTERVAL_S = float(os.getenv('INGEST_STATS_S', 30))      # How often to print throughput (0 disables)
+FLUSH_RETRIES = int(os.getenv('INGEST_FLUSH_RETRIES', 5))       # Retries of a batch hitting a transient error (locked DB)
+RETRY_BACKOFF_MS = int(os.getenv('INGEST_RETRY_BACKOFF_MS', 100))  # First retry delay, doubled on each attempt
+
+# Errors that belong to one row (constraint, bad value, wrong arity): that row is skipped, the rest written
+ROW_ERRORS = (sqlite3.IntegrityError, sqlite3.InterfaceError, sqlite3.ProgrammingError)
+
+_STOP = object()
+
+
+class _Checkpoint:
+    def __init__(self, callback):
+        self.callback = callback
+
+
+class BatchWriter:
+    """
+    Group-commit writer for SQLite.
+    Producers (e.g. MQTT on_message) call put() with a parameter tuple for
+    insert_sql; one long-lived thread owns the connection and flushes the
+    buffered rows with executemany in a single transaction every
+    flush_rows rows or flush_interval_ms milliseconds, whichever comes first.
+    after_flush(conn), if given, runs on the writer thread after every
+    committed batch (rollups, retention) so the DB keeps a single writer.
+    checkpoint(callback) lets a producer learn when everything it put so
+    far has been written (e.g. to commit Kafka offsets only after the DB).
+    A flush hitting sqlite3.OperationalError (database locked, I/O) is
+    retried with exponential backoff; rows failing a constraint are counted
+    as rejected and skipped without failing the rest of the batch.
+    """
+
+    def __init__(self, db_path, insert_sql, flush_rows=FLUSH_ROWS, flush_interval_ms=FLUSH_INTERVAL_MS,
+                 queue_size=QUEUE_SIZE, stats_interval_s=STATS_INTERVAL_S, name='ingestion', after_flush=None,
+                 retries=FLUSH_RETRIES, retry_backoff_ms=RETRY_BACKOFF_MS):
+        self.db_path = db_path
+        self.insert_sql = insert_sql
+        self.flush_rows = max(1, int(flush_rows))
+        self.flush_interval = max(0, flush_interval_ms) / 1000.0
+        self.stats_interval = stats_interval_s
+        self.name = name
+        self.after_flush = after_flush
+        self.retries = max(0, int(retries))
+        self.retry_backoff = max(0, retry_backoff_ms) / 1000.0
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._thread = threading.Thread(target=self._run, name=f'{name}-writer', daemon=True)
+        self._lock = threading.Lock()
+        self._failed_since_checkpoint = False
+        self._stats = {
+            'rows_written': 0,
+            'rows_failed': 0,
+            'rows_rejected': 0,
+            'retries': 0,
+            'flushes': 0,
+            'flush_seconds': 0.0,
+            'started_at': None,
+        }
+
+    # -------- Producer side --------
+    def start(self):
+        self._stats['started_at'] = time.time()
+        self._thread.start()
+        print(f"✅ Batch writer started ({self.flush_rows} rows / {int(self.flush_interval * 1000)} ms, "
+              f"queue {self._queue.maxsize}) → {self.db_path}")
+        return self
+
+    def put(self, row, block=True, timeout=None):
+        """Hand one row to the writer. Blocks (backpressure) when the queue is full."""
+        self._queue.put(row, block=block, timeout=timeout)
+
+    def checkpoint(self, callback):
+        """
+        Queue callback(ok) behind the rows already put. It runs on the writer
+        thread once they are flushed; ok is False if any flush since the
+        previous checkpoint failed.
+        """
+        self._queue.put(_Checkpoint(callback))
+
+    def close(self, timeout=None):
+        """Stop accepting rows, flush everything still queued and wait for the writer thread."""
+        if not self._thread.is_alive():
+            return
+        self._queue.put(_STOP)
+        self._thread.join(timeout)
+        self._print_stats(final=True)
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+        elapsed = max(time.time() - (stats['started_at'] or time.time()), 1e-9)
+        stats['queue_depth'] = self._queue.qsize()
+        stats['rows_per_s'] = stats['rows_written'] / elapsed
+        stats['avg_batch'] = stats['rows_written'] / stats['flushes'] if stats['flushes'] else 0.0
+        stats['avg_flush_ms'] = 1000 * stats['flush_seconds'] / stats['flushes'] if stats['flushes'] else 0.0
+        return stats
+
+    # -------- Writer thread --------
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path)
+        conn.execute("PRAGMA journal_mode=WAL")       # Readers (dashboard/API) don't block the writer
+        conn.execute("PRAGMA synchronous=NORMAL")     # Safe with WAL, avoids an fsync per commit
+        conn.execute("PRAGMA busy_timeout=5000")
+        return conn
+
+    def _write(self, conn, batch):
+        """Write batch in one transaction; returns how many rows were rejected by ROW_ERRORS."""
+        try:
+            with conn:  # One transaction per batch
+                conn.executemany(self.insert_sql, batch)
+            return 0
+        except ROW_ERRORS:
+            pass
+        # Some row is bad: redo the batch row by row so only the offending rows are dropped
+        rejected = 0
+        with conn:
+            for row in batch:
+                try:
+                    conn.execute(self.insert_sql, row)
+                except ROW_ERRORS as e:
+                    rejected += 1
+                    if rejected == 1:
+                        print(f"⚠️ Rejected row {row!r}: {e}")
+        return rejected
+
+    def _flush(self, conn, batch):
+        start = time.perf_counter()
+        written = failed = rejected = retries = 0
+        for attempt in range(self.retries + 1):
+            try:
+                rejected = self._write(conn, batch)
+                written = len(batch) - rejected
+                break
+            except sqlite3.OperationalError as e:
+                if attempt == self.retries:
+                    print(f"❌ Batch write failed after {attempt + 1} attempts ({len(batch)} rows): {e}")
+                    failed = len(batch)
+                    break
+                retries += 1
+                time.sleep(self.retry_backoff * 2 ** attempt)
+            except sqlite3.Error as e:
+                print(f"❌ Batch write failed ({len(batch)} rows): {e}")
+                failed = len(batch)
+                break
+        if failed:
+            self._failed_since_checkpoint = True
+        if rejected:
+            print(f"⚠️ {rejected} of {len(batch)} rows rejected by constraints, rest of the batch written")
+        with self._lock:
+            self._stats['rows_written'] += written
+            self._stats['rows_failed'] += failed
+            self._stats['rows_rejected'] += rejected
+            self._stats['retries'] += retries
+            self._stats['flushes'] += 1
+            self._stats['flush_seconds'] += time.perf_counter() - start
+        if written and self.after_flush is not None:
+            try:
+                self.after_flush(conn)
+            except sqlite3.Error as e:
+                print(f"❌ after_flush hook failed: {e}")
+
+    def _run_checkpoint(self, conn, batch, checkpoint):
+        if batch:
+            self._flush(conn, batch)
+            batch.clear()
+        ok, self._failed_since_checkpoint = not self._failed_since_checkpoint, False
+        try:
+            checkpoint.callback(ok)
+        except Exception as e:
+            print(f"❌ Checkpoint callback failed: {e}")
+
+    def _run(self):
+        conn = self._connect()
+        batch = []
+        deadline = None
+        next_stats = time.time() + self.stats_interval if self.stats_interval else None
+        stopping = False
+        try:
+            while not stopping:
+                timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+                if next_stats is not None:
+                    stats_wait = max(0.0, next_stats - time.time())
+                    timeout = stats_wait if timeout is None else min(timeout, stats_wait)
+                try:
+                    item = self._queue.get(timeout=timeout)
+                    if item is _STOP:
+                        stopping = True
+                    elif isinstance(item, _Checkpoint):
+                        self._run_checkpoint(conn, batch, item)
+                        deadline = None
+                    else:
+                        if not batch:
+                            deadline = time.monotonic() + self.flush_interval
+                        batch.append(item)
+                        # Drain whatever is already waiting without blocking
+                        while len(batch) < self.flush_rows:
+                            item = self._queue.get_nowait()
+                            if item is _STOP:
+                                stopping = True
+                                break
+                            if isinstance(item, _Checkpoint):
+                                self._run_checkpoint(conn, batch, item)
+                                deadline = None
+                                break
+                            batch.append(item)
+                except queue.Empty:
+                    pass
+
+                if batch and (stopping or len(batch) >= self.flush_rows or time.monotonic() >= deadline):
+                    self._flush(conn, batch)
+                    batch = []
+                    deadline = None
+
+                if next_stats is not None and time.time() >= next_stats:
+                    self._print_stats()
+                    next_stats = time.time() + self.stats_interval
+        finally:
+            if batch:
+                self._flush(conn, batch)
+            conn.close()
+
+    def _print_stats(self, final=False):
+        s = self.stats()
+        label = "final" if final else "throughput"
+        print(f"📊 [{self.name}] {label}: {s['rows_per_s']:.1f} rows/s, {s['rows_written']} written, "
+              f"{s['rows_failed']} failed, {s['rows_rejected']} rejected, {s['retries']} retries, "
+              f"{s['flushes']} flushes (avg {s['avg_batch']:.1f} rows, "
+              f"{s['avg_flush_ms']:.1f} ms), queue depth {s['queue_depth']}")
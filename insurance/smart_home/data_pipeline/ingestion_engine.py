@@ -0,0 +1,349 @@
+import os
+import ssl
+import json
+import queue
+import signal
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from batch_writer import BatchWriter
+
+try:  # Faster payload decoding when available
+    import orjson
+    _loads = orjson.loads
+except ImportError:
+    _loads = json.loads
+
+# Stage queue between the transport and the decoder (payloads, not rows)
+RAW_QUEUE_SIZE = int(os.getenv('INGEST_RAW_QUEUE_SIZE', 10000))
+# How long a push transport (MQTT/HTTP) may wait for room before reporting an overflow
+PUT_TIMEOUT_S = float(os.getenv('INGEST_PUT_TIMEOUT_S', 5))
+
+_STOP = object()
+
+
+def _records(payload):
+    """
+    Records in a payload: a JSON object, a JSON list, or NDJSON (one object
+    per line). Returns (records, bad): malformed NDJSON lines are skipped and
+    counted, a malformed single document raises ValueError.
+    """
+    try:
+        data = _loads(payload)
+    except ValueError:
+        lines = [line for line in payload.splitlines() if line.strip()]
+        if len(lines) < 2:
+            raise
+        records, bad = [], 0
+        for line in lines:
+            try:
+                records.append(_loads(line))
+            except ValueError:
+                bad += 1
+        return records, bad
+    return (data if isinstance(data, list) else [data]), 0
+
+
+class _Checkpoint:
+    def __init__(self, callback):
+        self.callback = callback
+
+
+# ======================================================
+# Engine: transport -> [raw queue] -> decode -> [row queue] -> BatchWriter
+# ======================================================
+
+class IngestionEngine:
+    """
+    One ingestion pipeline for every transport.
+    A source (MqttSource, KafkaSource, HttpSource) hands raw payloads to
+    submit(); a decode thread turns them into INSERT rows with row_fn(dict)
+    and feeds a BatchWriter, which owns the DB. Both hand-offs are bounded
+    queues, so a slow database fills them and the source slows down (Kafka
+    stops polling, HTTP answers 503) instead of rows piling up in memory.
+    MQTT cannot pause the broker, so it waits up to put_timeout_s and then
+    counts and reports an overflow rather than stalling its network loop.
+    """
+
+    def __init__(self, db_path, insert_sql, row_fn, name='ingestion', after_flush=None,
+                 raw_queue_size=RAW_QUEUE_SIZE, put_timeout_s=PUT_TIMEOUT_S, **writer_kwargs):
+        self.row_fn = row_fn
+        self.name = name
+        self.put_timeout_s = put_timeout_s
+        self.writer = BatchWriter(db_path, insert_sql, name=name, after_flush=after_flush, **writer_kwargs)
+        self._raw = queue.Queue(maxsize=raw_queue_size)
+        self._decoder = threading.Thread(target=self._decode_loop, name=f'{name}-decoder', daemon=True)
+        self._stopped = threading.Event()
+        self._lock = threading.Lock()
+        self._stats = {'received': 0, 'decoded': 0, 'decode_errors': 0, 'overflows': 0}
+
+    # -------- Source side --------
+    def submit(self, payload, block=True, timeout=None):
+        """Queue one raw payload (bytes/str: a JSON object or list of objects). False if no room in time."""
+        try:
+            self._raw.put(payload, block=block, timeout=timeout)
+        except queue.Full:
+            with self._lock:
+                self._stats['overflows'] += 1
+                overflows = self._stats['overflows']
+            if overflows == 1 or overflows % 1000 == 0:
+                print(f"❌ [{self.name}] ingestion queue full, {overflows} payloads rejected so far")
+            return False
+        with self._lock:
+            self._stats['received'] += 1
+        return True
+
+    def checkpoint(self, callback):
+        """callback(ok) runs on the writer thread once every payload submitted so far is written."""
+        self._raw.put(_Checkpoint(callback))
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+        stats['raw_queue_depth'] = self._raw.qsize()
+        stats.update({f'writer_{k}': v for k, v in self.writer.stats().items()})
+        return stats
+
+    # -------- Decode stage --------
+    def _reject(self, n, reason):
+        with self._lock:
+            self._stats['decode_errors'] += n
+            total = self._stats['decode_errors']
+        if total == n or total // 1000 > (total - n) // 1000:  # First one, then every ~1000
+            print(f"❌ [{self.name}] skipped {n} bad records ({reason}); {total} so far")
+
+    def _decode_loop(self):
+        while True:
+            item = self._raw.get()
+            if item is _STOP:
+                return
+            if isinstance(item, _Checkpoint):
+                self.writer.checkpoint(item.callback)  # Stays in order behind the rows before it
+                continue
+            try:
+                records, bad = _records(item)
+            except (ValueError, TypeError) as e:
+                self._reject(1, e)
+                continue
+            if bad:
+                self._reject(bad, "malformed NDJSON line")
+            rows = []
+            for record in records:  # One bad record must not cost the good ones in its payload
+                try:
+                    rows.append(self.row_fn(record))
+                except (ValueError, KeyError, TypeError, AttributeError) as e:
+                    self._reject(1, e)
+            for row in rows:
+                self.writer.put(row)  # Blocks when the writer is behind: backpressure up the pipeline
+            with self._lock:
+                self._stats['decoded'] += len(rows)
+
+    # -------- Lifecycle --------
+    def stop(self):
+        self._stopped.set()
+
+    def run(self, source):
+        """Run source until stop(), SIGTERM or Ctrl-C, then drain every stage."""
+        self.writer.start()
+        self._decoder.start()
+        signal.signal(signal.SIGTERM, lambda signum, frame: self.stop())  # main.py terminates us
+        try:
+            source.start(self)
+            while not self._stopped.is_set() and source.is_alive():
+                self._stopped.wait(0.5)
+        except KeyboardInterrupt:
+            print("🛑 Ingestion stopped.")
+        finally:
+            source.stop()
+            self._raw.put(_STOP)
+            self._decoder.join()
+            self.writer.close()  # Drain queued rows before exiting
+            s = self.stats()
+            print(f"📊 [{self.name}] {s['received']} payloads, {s['decoded']} rows decoded, "
+                  f"{s['decode_errors']} decode errors, {s['overflows']} overflows")
+
+
+# ======================================================
+# Transport adapters
+# ======================================================
+
+class MqttSource:
+    """Subscribes to topics; tls=dict(ca_certs=..., certfile=..., keyfile=...) enables TLS (AWS IoT Core)."""
+
+    def __init__(self, host, port, topics, client_id=None, tls=None, qos=0, keepalive=60):
+        self.host = host
+        self.port = port
+        self.topics = list(topics)
+        self.client_id = client_id
+        self.tls = tls
+        self.qos = qos
+        self.keepalive = keepalive
+        self.client = None
+
+    def start(self, engine):
+        import paho.mqtt.client as mqtt
+        self.client = mqtt.Client(client_id=self.client_id) if self.client_id else mqtt.Client()
+        if self.tls:
+            self.client.tls_set(cert_reqs=ssl.CERT_REQUIRED, tls_version=ssl.PROTOCOL_TLSv1_2, **self.tls)
+
+        def on_connect(client, userdata, flags, rc):
+            if rc == 0:
+                print(f"✅ Connected to MQTT for ingestion ({self.host}:{self.port}).")
+                for topic in self.topics:
+                    client.subscribe(topic, qos=self.qos)
+                    print(f"📥 Subscribed to {topic}")
+            else:
+                print(f"❌ MQTT connect failed: {rc}")
+
+        def on_message(client, userdata, msg):
+            # Only a queue hand-off here; decoding happens on the engine's decode thread
+            engine.submit(msg.payload, timeout=engine.put_timeout_s)
+
+        self.client.on_connect = on_connect
+        self.client.on_message = on_message
+        self.client.connect(self.host, self.port, self.keepalive)
+        self.client.loop_start()  # Network loop on its own thread
+
+    def is_alive(self):
+        return True
+
+    def stop(self):
+        if self.client is not None:
+            self.client.disconnect()
+            self.client.loop_stop()
+
+
+class KafkaSource:
+    """
+    Polls topics in batches on its own thread. The next poll only happens
+    once the batch is queued, and offsets are committed only after the
+    writer has committed the rows (at-least-once); a failed write rewinds.
+    After a rewind, batches polled before it are not committed for that
+    partition (their end offsets would skip the failed batch) until the
+    rewound offset has been written again.
+    """
+
+    def __init__(self, bootstrap_servers, topics, group_id, batch_size=500, poll_timeout_ms=1000,
+                 auto_offset_reset='latest'):
+        self.bootstrap_servers = bootstrap_servers
+        self.topics = list(topics)
+        self.group_id = group_id
+        self.batch_size = batch_size
+        self.poll_timeout_ms = poll_timeout_ms
+        self.auto_offset_reset = auto_offset_reset
+        self._done = queue.Queue()
+        self._rewound = {}  # partition -> offset rewound to, until a batch starting there is written
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self, engine):
+        self._thread = threading.Thread(target=self._run, args=(engine,), name='kafka-source', daemon=True)
+        self._thread.start()
+
+    def _run(self, engine):
+        from kafka import KafkaConsumer, OffsetAndMetadata
+        consumer = KafkaConsumer(
+            *self.topics,
+            bootstrap_servers=self.bootstrap_servers,
+            auto_offset_reset=self.auto_offset_reset,
+            enable_auto_commit=False,
+            group_id=self.group_id
+        )
+        print(f"📥 Kafka source polling {', '.join(self.topics)} ({self.batch_size} records / {self.poll_timeout_ms} ms)")
+        try:
+            while not self._stop.is_set():
+                self._commit_done(consumer)
+                polled = consumer.poll(timeout_ms=self.poll_timeout_ms, max_records=self.batch_size)
+                if not polled:
+                    continue
+                starts = {tp: messages[0].offset for tp, messages in polled.items()}
+                ends = {tp: OffsetAndMetadata(messages[-1].offset + 1, None) for tp, messages in polled.items()}
+                for messages in polled.values():
+                    for message in messages:
+                        engine.submit(message.value)  # Blocks while the pipeline is full
+                engine.checkpoint(lambda ok, starts=starts, ends=ends: self._done.put((ok, starts, ends)))
+        finally:
+            self._commit_done(consumer)  # Batches not yet written are simply re-delivered next time
+            consumer.close()
+
+    def _commit_done(self, consumer):
+        # KafkaConsumer is not thread-safe, so the writer only reports and this thread commits
+        while True:
+            try:
+                ok, starts, ends = self._done.get_nowait()
+            except queue.Empty:
+                return
+            if ok:
+                commit = {}
+                for tp, end in ends.items():
+                    if tp in self._rewound:
+                        if starts[tp] > self._rewound[tp]:
+                            continue  # Polled before the rewind; its rows are re-delivered anyway
+                        del self._rewound[tp]
+                    commit[tp] = end
+                if commit:
+                    consumer.commit(commit)
+            else:
+                print("❌ Batch write failed, rewinding Kafka offsets")
+                for tp, offset in starts.items():
+                    if offset < self._rewound.get(tp, offset + 1):  # Never seek forward past an earlier rewind
+                        consumer.seek(tp, offset)
+                        self._rewound[tp] = offset
+
+    def is_alive(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+
+class HttpSource:
+    """POST a JSON object, a JSON list or NDJSON to path; 202 when queued, 503 when the pipeline is full (retry)."""
+
+    def __init__(self, host='0.0.0.0', port=8081, path='/ingest'):
+        self.host = host
+        self.port = port
+        self.path = path
+        self.server = None
+        self._thread = None
+
+    def start(self, engine):
+        path = self.path
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                if self.path != path:
+                    self.send_error(404)
+                    return
+                body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+                # NDJSON is queued as is (the whole request is queued or rejected); the decoder splits it
+                if not engine.submit(body, timeout=engine.put_timeout_s):
+                    self.send_error(503, "Ingestion queue full, retry later")
+                    return
+                self.send_response(202)
+                self.end_headers()
+
+            def log_message(self, format, *args):
+                pass  # Per-request logging would dominate at high rates
+
+        self.server = ThreadingHTTPServer((self.host, self.port), Handler)
+        self._thread = threading.Thread(target=self.server.serve_forever, name='http-source', daemon=True)
+        self._thread.start()
+        print(f"📥 HTTP source listening on {self.host}:{self.port}{self.path}")
+
+    def is_alive(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def stop(self):
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+
+
+def mqtt_tls(endpoint, ca_path, cert_path, key_path):
+    """TLS settings for MqttSource: on for remote endpoints (IoT Core), off for a local broker."""
+    if endpoint == 'localhost':
+        return None
+    return {'ca_certs': ca_path, 'certfile': cert_path, 'keyfile': key_path}
@@ -0,0 +1,200 @@
+import os
+import time
+import sqlite3
+from datetime import datetime
+
+import pandas as pd
+
+from schema import ROLLUP_TABLES, to_epoch_ms
+
+# Retention config (days); rollups are cheap, so they outlive raw rows
+RAW_RETENTION_DAYS = float(os.getenv('RAW_RETENTION_DAYS', 7))
+ROLLUP_1M_RETENTION_DAYS = float(os.getenv('ROLLUP_1M_RETENTION_DAYS', 90))
+PRUNE_BATCH = int(os.getenv('PRUNE_BATCH', 5000))             # Rows per DELETE, keeps write locks short
+PRUNE_INTERVAL_S = float(os.getenv('PRUNE_INTERVAL_S', 60))    # How often the writer prunes
+ROLLUP_CHUNK = 100000                                          # Max raw rows folded into rollups per transaction
+
+# metric name -> SQL expression over a sensor_data row (typed readings columns, schema v4)
+METRICS = {
+    'temp_C': 'temp_C',
+    'humidity_percent': 'humidity_percent',
+    'smoke_ppm': 'smoke_ppm',
+    'moisture_percent': 'moisture_percent',
+}
+
+DAY_MS = 24 * 60 * 60 * 1000
+WATERMARK = 'rollup_last_rowid'
+
+ROLLUP_UPSERT = """
+    INSERT INTO {table} (tenant_id, device, metric, bucket_ts, min_val, max_val, sum_val, count)
+    SELECT tenant_id, device, '{metric}', (ts / {bucket_ms}) * {bucket_ms}, MIN(v), MAX(v), SUM(v), COUNT(v)
+    FROM (
+        SELECT tenant_id, device, ts, {expr} AS v
+        FROM sensor_data WHERE rowid > ? AND rowid <= ?
+    )
+    WHERE v IS NOT NULL AND ts IS NOT NULL
+    GROUP BY tenant_id, device, ts / {bucket_ms}
+    ON CONFLICT (tenant_id, device, metric, bucket_ts) DO UPDATE SET
+        min_val = MIN(min_val, excluded.min_val),
+        max_val = MAX(max_val, excluded.max_val),
+        sum_val = sum_val + excluded.sum_val,
+        count = count + excluded.count
+"""
+
+
+def _now_ms():
+    # Readings carry naive local timestamps (datetime.now()), which to_epoch_ms reads as UTC
+    return to_epoch_ms(datetime.now())
+
+
+def _get_state(conn, name, default=0):
+    row = conn.execute("SELECT value FROM pipeline_state WHERE name = ?", (name,)).fetchone()
+    return row[0] if row else default
+
+
+def _set_state(conn, name, value):
+    conn.execute("""
+        INSERT INTO pipeline_state (name, value) VALUES (?, ?)
+        ON CONFLICT (name) DO UPDATE SET value = excluded.value
+    """, (name, value))
+
+
+class Retention:
+    """
+    Keeps raw sensor_data for a fixed window and maintains 1-minute and
+    1-hour rollups (min/max/sum/count per tenant, device and metric).
+    Rollups are folded in incrementally from the rows added since the last
+    call (rowid watermark in pipeline_state), and expired raw rows are
+    deleted in small batches. Use after_flush as the BatchWriter hook.
+    """
+
+    def __init__(self, raw_retention_days=RAW_RETENTION_DAYS, rollup_1m_retention_days=ROLLUP_1M_RETENTION_DAYS,
+                 prune_batch=PRUNE_BATCH, prune_interval_s=PRUNE_INTERVAL_S, metrics=METRICS):
+        self.raw_retention_ms = int(raw_retention_days * DAY_MS)
+        self.rollup_1m_retention_ms = int(rollup_1m_retention_days * DAY_MS)
+        self.prune_batch = prune_batch
+        self.prune_interval_s = prune_interval_s
+        self.metrics = metrics
+        self._next_prune = 0.0
+
+    def update_rollups(self, conn):
+        """Fold sensor_data rows added since the last call into every rollup tier."""
+        last = _get_state(conn, WATERMARK)
+        top = conn.execute("SELECT MAX(rowid) FROM sensor_data").fetchone()[0] or 0
+        folded = 0
+        while last < top:
+            upper = min(top, last + ROLLUP_CHUNK)
+            with conn:  # Rollups and watermark move together
+                for table, bucket_ms in ROLLUP_TABLES.values():
+                    for metric, expr in self.metrics.items():
+                        conn.execute(ROLLUP_UPSERT.format(table=table, metric=metric, expr=expr, bucket_ms=bucket_ms),
+                                     (last, upper))
+                _set_state(conn, WATERMARK, upper)
+            folded += upper - last
+            last = upper
+        return folded
+
+    def prune(self, conn, max_batches=10):
+        """Delete up to max_batches * prune_batch expired rows (raw and 1m tier). Returns rows deleted."""
+        now = _now_ms()
+        rolled_up = _get_state(conn, WATERMARK)  # Never drop raw rows that are not in the rollups yet
+        deleted = 0
+        for _ in range(max_batches):
+            with conn:
+                cur = conn.execute("""
+                    DELETE FROM sensor_data WHERE rowid IN (
+                        SELECT rowid FROM sensor_data WHERE ts < ? AND rowid <= ? LIMIT ?
+                    )
+                """, (now - self.raw_retention_ms, rolled_up, self.prune_batch))
+            deleted += cur.rowcount
+            if cur.rowcount < self.prune_batch:
+                break
+        table_1m = ROLLUP_TABLES['1m'][0]
+        for _ in range(max_batches):
+            with conn:
+                cur = conn.execute(f"""
+                    DELETE FROM {table_1m} WHERE (tenant_id, device, metric, bucket_ts) IN (
+                        SELECT tenant_id, device, metric, bucket_ts FROM {table_1m} WHERE bucket_ts < ? LIMIT ?
+                    )
+                """, (now - self.rollup_1m_retention_ms, self.prune_batch))
+            deleted += cur.rowcount
+            if cur.rowcount < self.prune_batch:
+                break
+        return deleted
+
+    def after_flush(self, conn):
+        """BatchWriter hook: fold the new rows into the rollups, prune every prune_interval_s."""
+        self.update_rollups(conn)
+        if time.monotonic() >= self._next_prune:
+            deleted = self.prune(conn)
+            if deleted:
+                print(f"🧹 Pruned {deleted} expired rows.")
+            self._next_prune = time.monotonic() + self.prune_interval_s
+
+
+def pick_resolution(start_ms, end_ms, now_ms=None):
+    """Coarsest tier that still gives a useful chart for the range (~a few thousand points max)."""
+    now_ms = now_ms or _now_ms()
+    span = end_ms - start_ms
+    if span <= 6 * 60 * 60 * 1000 and start_ms >= now_ms - RAW_RETENTION_DAYS * DAY_MS:
+        return 'raw'
+    if span <= 3 * DAY_MS and start_ms >= now_ms - ROLLUP_1M_RETENTION_DAYS * DAY_MS:
+        return '1m'
+    return '1h'
+
+
+def read_range(conn, tenant_id, device, start, end=None, resolution='auto', metrics=None):
+    """
+    Readings for one device between start and end (datetimes, ISO strings or epoch ms)
+    at 'raw', '1m', '1h' or 'auto' resolution. Rollup tiers return the mean per bucket
+    in the metric column plus <metric>_min / <metric>_max and the bucket count.
+    """
+    start_ms = start if isinstance(start, int) else to_epoch_ms(start)
+    end_ms = _now_ms() if end is None else end if isinstance(end, int) else to_epoch_ms(end)
+    metrics = metrics or list(METRICS)
+    if resolution == 'auto':
+        resolution = pick_resolution(start_ms, end_ms)
+
+    if resolution == 'raw':
+        cols = ", ".join(f"{METRICS[m]} AS {m}" for m in metrics)
+        df = pd.read_sql(f"""
+            SELECT ts, {cols} FROM sensor_data
+            WHERE tenant_id = ? AND device = ? AND ts >= ? AND ts < ?
+            ORDER BY ts
+        """, conn, params=(tenant_id, device, start_ms, end_ms))
+    else:
+        table = ROLLUP_TABLES[resolution][0]
+        cols = ",\n".join(
+            f"MAX(CASE WHEN metric = '{m}' THEN sum_val / count END) AS {m}, "
+            f"MAX(CASE WHEN metric = '{m}' THEN min_val END) AS {m}_min, "
+            f"MAX(CASE WHEN metric = '{m}' THEN max_val END) AS {m}_max"
+            for m in metrics
+        )
+        df = pd.read_sql(f"""
+            SELECT bucket_ts AS ts, {cols}, MAX(count) AS count FROM {table}
+            WHERE tenant_id = ? AND device = ? AND bucket_ts >= ? AND bucket_ts < ?
+            GROUP BY bucket_ts ORDER BY bucket_ts
+        """, conn, params=(tenant_id, device, start_ms, end_ms))
+    df.insert(0, 'timestamp', pd.to_datetime(df['ts'], unit='ms'))
+    df.attrs['resolution'] = resolution
+    return df
+
+
+if __name__ == "__main__":
+    import argparse
+    from schema import init_db
+    parser = argparse.ArgumentParser(description="Fold new rows into the rollup tiers and prune expired history.")
+    parser.add_argument("db_path", nargs="?", default=os.getenv('DB_PATH', '/app/smart_home.db'))
+    args = parser.parse_args()
+    init_db(args.db_path)
+    conn = sqlite3.connect(args.db_path)
+    retention = Retention()
+    print(f"📦 Rolled up {retention.update_rollups(conn)} rows.")
+    total = 0
+    while True:
+        deleted = retention.prune(conn)
+        total += deleted
+        if not deleted:
+            break
+    print(f"🧹 Pruned {total} expired rows ({datetime.now().isoformat()}).")
+    conn.close()
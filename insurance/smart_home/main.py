@@ -12,6 +12,9 @@ from dotenv import load_dotenv
 
 load_dotenv()  # Load .env variables
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "data_pipeline"))
+from schema import init_db  # sensor_data schema + migrations
+
 import jwt
 import datetime
 
@@ -100,14 +103,17 @@ def api_live_data(device):
     tenant_id = request.current_user['tenant_id']
     conn = sqlite3.connect(DB_PATH)
     query = """
-        SELECT timestamp, device, readings
+        SELECT timestamp, device, readings,
+               smoke_ppm, moisture_percent, temp_C, humidity_percent,
+               alarm, leak_detected, state, motion_detected
         FROM sensor_data 
         WHERE tenant_id = ? AND device = ? 
-        ORDER BY timestamp DESC LIMIT 100
-    """
+        ORDER BY ts DESC LIMIT 100
+    """  # Served by idx_sensor_data_tenant_device_ts
     df = pd.read_sql(query, conn, params=(tenant_id, device))
     conn.close()
-    # Return oldest first for charts; readings is JSON string, frontend can parse
+    df = df.astype(object).where(df.notna(), None)  # NULL typed fields -> null, not NaN
+    # Return oldest first for charts; typed columns are ready to plot, readings (JSON string) has the rest
     return jsonify(df[::-1].to_dict(orient='records'))
 
 
@@ -170,6 +176,9 @@ def main():
 
     base_dir = os.path.dirname(os.path.abspath(__file__))
 
+    # Upgrade existing DBs (ts column + indexes) before the API reads them
+    init_db(DB_PATH)
+
     # Paths (adjusted for insurance project files)
     simulate_path = os.path.join(base_dir, "data_pipeline", "data.py")
     ingestion_path = os.path.join(base_dir, "data_pipeline", "data_ingestion.py")
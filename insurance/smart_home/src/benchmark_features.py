@@ -0,0 +1,95 @@
+# benchmark_features.py (Row loop vs bulk readings feature extraction)
+
+import json
+import time
+import argparse
+
+import numpy as np
+import pandas as pd
+
+from readings_features import NUMERIC_FEATURES, available_features, extract_features, risk_labels
+
+DEVICES = ["smoke_detector", "water_sensor", "door_sensor", "temperature_sensor", "humidity_sensor", "motion_detector"]
+
+
+def make_rows(n, seed=42):
+    """Synthetic sensor_data rows with the same readings shapes data.py publishes."""
+    rng = np.random.default_rng(seed)
+    device_idx = rng.integers(0, len(DEVICES), n)
+    values = rng.random(n)
+    readings = []
+    for d, v in zip(device_idx, values):
+        device = DEVICES[d]
+        if device == "smoke_detector":
+            r = {"smoke_ppm": round(v * 60, 2), "alarm": bool(v > 0.83)}
+        elif device == "water_sensor":
+            r = {"moisture_percent": round(v * 60, 2), "leak_detected": bool(v > 0.83)}
+        elif device == "door_sensor":
+            r = {"state": "open" if v > 0.9 else "closed", "last_change": None}
+        elif device == "temperature_sensor":
+            r = {"temp_C": round(5 + v * 30, 2)}
+        elif device == "humidity_sensor":
+            r = {"humidity_percent": round(30 + v * 50, 2)}
+        else:
+            r = {"motion_detected": bool(v > 0.9), "last_detected": None}
+        readings.append(json.dumps(r))
+    return pd.DataFrame({
+        "timestamp": pd.date_range("2025-01-01", periods=n, freq="s").astype(str),
+        "device": [DEVICES[d] for d in device_idx],
+        "readings": readings,
+        "tenant_id": "demo",
+    })
+
+
+def legacy_prepare(df):
+    """The previous per-row implementation of prepare_features_and_labels, kept for comparison."""
+    parsed_data = []
+    for _, row in df.iterrows():
+        readings = json.loads(row['readings'])
+        parsed_row = {'device': row['device'], 'tenant_id': row.get('tenant_id', 'demo')}
+        for key, value in readings.items():
+            if isinstance(value, (int, float)) and key in NUMERIC_FEATURES:
+                parsed_row[key] = value
+        parsed_row['high_risk'] = 1 if (
+            parsed_row.get('temp_C', 0) > 30 or
+            parsed_row.get('temp_C', 0) < 10 or
+            parsed_row.get('humidity_percent', 0) > 70 or
+            parsed_row.get('smoke_ppm', 0) > 20 or
+            parsed_row.get('moisture_percent', 0) > 30
+        ) else 0
+        parsed_data.append(parsed_row)
+    parsed_df = pd.DataFrame(parsed_data)
+    available = [f for f in NUMERIC_FEATURES if f in parsed_df.columns]
+    return parsed_df[available].fillna(parsed_df[available].mean()), parsed_df['high_risk']
+
+
+def bulk_prepare(df):
+    features = extract_features(df)
+    cols = available_features(features)
+    return features[cols].fillna(features[cols].mean()), risk_labels(features)
+
+
+def run(sizes, legacy_max=1_000_000):
+    for n in sizes:
+        df = make_rows(n)
+        start = time.perf_counter()
+        X_new, y_new = bulk_prepare(df)
+        t_new = time.perf_counter() - start
+        if n > legacy_max:
+            print(f"📊 {n:>9,} rows: bulk {t_new:.2f}s (legacy skipped)")
+            continue
+        start = time.perf_counter()
+        X_old, y_old = legacy_prepare(df)
+        t_old = time.perf_counter() - start
+        # Same features and labels, not just faster
+        pd.testing.assert_frame_equal(X_new.reset_index(drop=True), X_old[X_new.columns].astype('float64'))
+        assert (y_new.to_numpy() == y_old.to_numpy()).all()
+        print(f"📊 {n:>9,} rows: legacy {t_old:.2f}s, bulk {t_new:.2f}s → {t_old / t_new:.1f}x faster")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark readings feature extraction.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--legacy-max", type=int, default=1_000_000, help="Skip the slow loop above this many rows")
+    args = parser.parse_args()
+    run(args.sizes, args.legacy_max)
@@ -1,48 +1,26 @@
 # train_predictor.py (Modified for Smart Home Property Insurance Demo)
 
-import pandas as pd
-import numpy as np
-import json
+import os
+import sys
 from sklearn.linear_model import LogisticRegression
 from sklearn.model_selection import train_test_split
 from sklearn.metrics import accuracy_score
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from readings_features import available_features, extract_features, risk_labels
+
 def prepare_features_and_labels(df):
     """
     Prepares X and y from smart home df.
-    Assumes df has 'readings' JSON; creates features from numerics.
+    Assumes df has the typed readings columns (schema v4) or 'readings' JSON; creates features from numerics.
     y is synthetic 'high_risk' label based on thresholds (e.g., for demo: high temp/smoke/moisture = risk).
     """
-    # Parse JSON readings
-    parsed_data = []
-    for _, row in df.iterrows():
-        readings = json.loads(row['readings'])
-        parsed_row = {
-            'device': row['device'],
-            'tenant_id': row.get('tenant_id', 'demo')
-        }
-        # Flatten numeric features
-        for key, value in readings.items():
-            if isinstance(value, (int, float)) and key in ['temp_C', 'humidity_percent', 'smoke_ppm', 'moisture_percent']:
-                parsed_row[key] = value
-        # Synthetic label: high risk if any extreme value (demo purposes)
-        risk = 1 if (
-            parsed_row.get('temp_C', 0) > 30 or
-            parsed_row.get('temp_C', 0) < 10 or
-            parsed_row.get('humidity_percent', 0) > 70 or
-            parsed_row.get('smoke_ppm', 0) > 20 or
-            parsed_row.get('moisture_percent', 0) > 30
-        ) else 0
-        parsed_row['high_risk'] = risk
-        parsed_data.append(parsed_row)
-    
-    parsed_df = pd.DataFrame(parsed_data)
+    parsed_df = extract_features(df)
+    y = risk_labels(parsed_df)
     
     # Select features
-    feature_cols = ['temp_C', 'humidity_percent', 'smoke_ppm', 'moisture_percent']
-    available_features = [f for f in feature_cols if f in parsed_df.columns]
-    X = parsed_df[available_features].fillna(parsed_df[available_features].mean())
-    y = parsed_df['high_risk']
+    feature_cols = available_features(parsed_df)
+    X = parsed_df[feature_cols].fillna(parsed_df[feature_cols].mean())
     
     return X, y
 
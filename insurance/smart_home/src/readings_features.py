@@ -0,0 +1,86 @@
+# readings_features.py (Shared feature extraction for smart home readings)
+
+import json
+
+import numpy as np
+import pandas as pd
+
+try:  # Much faster than json for the bulk decode below
+    import orjson
+    _loads = orjson.loads
+except ImportError:
+    _loads = json.loads
+
+NUMERIC_FEATURES = ['temp_C', 'humidity_percent', 'smoke_ppm', 'moisture_percent']
+FEATURE_DTYPE = 'float64'  # Every feature column, whatever the source; missing -> NaN
+
+# Synthetic 'high_risk' thresholds (demo); a missing reading counts as 0, as before
+RISK_RULES = [
+    ('temp_C', '>', 30),
+    ('temp_C', '<', 10),
+    ('humidity_percent', '>', 70),
+    ('smoke_ppm', '>', 20),
+    ('moisture_percent', '>', 30),
+]
+
+
+def _decode_column(readings):
+    """Series of JSON strings (or dicts) -> list of dicts, decoded in one pass where possible."""
+    values = readings.tolist()
+    if not values or isinstance(values[0], dict):
+        return values
+    try:
+        # One decoder call for the whole column instead of one per row
+        return _loads("[" + ",".join(values) + "]")
+    except (ValueError, TypeError):
+        # A bad row somewhere: fall back to per-row decoding and drop what doesn't parse
+        decoded = []
+        for value in values:
+            try:
+                decoded.append(value if isinstance(value, dict) else _loads(value))
+            except (ValueError, TypeError):
+                decoded.append({})
+        return decoded
+
+
+def _numeric_column(dicts, key):
+    # Only numbers count (bools as 0/1), same as the old isinstance(value, (int, float)) check
+    return np.array([v if isinstance(v, (int, float)) else np.nan for v in (d.get(key) for d in dicts)],
+                    dtype=FEATURE_DTYPE)
+
+
+def extract_features(df):
+    """
+    Columnar features from sensor_data rows: timestamp/device/tenant_id (when
+    present) plus one FEATURE_DTYPE column per NUMERIC_FEATURES entry.
+    Uses the typed columns (schema v4) directly when df has them, otherwise
+    decodes the 'readings' column (JSON strings or dicts) in bulk.
+    """
+    out = pd.DataFrame(index=df.index)
+    for col in ('timestamp', 'device'):
+        if col in df.columns:
+            out[col] = df[col]
+    out['tenant_id'] = df['tenant_id'] if 'tenant_id' in df.columns else 'demo'
+
+    if set(NUMERIC_FEATURES).issubset(df.columns):
+        for f in NUMERIC_FEATURES:
+            out[f] = pd.to_numeric(df[f], errors='coerce').astype(FEATURE_DTYPE)
+    else:
+        dicts = _decode_column(df['readings'])
+        for f in NUMERIC_FEATURES:
+            out[f] = _numeric_column(dicts, f)
+    return out
+
+
+def available_features(features):
+    """Feature columns with at least one value (all-NaN columns are useless to the models)."""
+    return [f for f in NUMERIC_FEATURES if f in features.columns and features[f].notna().any()]
+
+
+def risk_labels(features):
+    """Vectorized synthetic 'high_risk' label (0/1) from RISK_RULES."""
+    risk = np.zeros(len(features), dtype=bool)
+    for col, op, threshold in RISK_RULES:
+        values = features[col].fillna(0).to_numpy()
+        risk |= values > threshold if op == '>' else values < threshold
+    return pd.Series(risk.astype('int64'), index=features.index, name='high_risk')
@@ -0,0 +1,77 @@
+# insurance/smart_home/tests/test_home_schema.py
+import os
+import json
+import sqlite3
+import importlib.util
+
+import pytest
+
+# Loaded by path: the kitchen and smart home pipelines both have a schema.py
+_spec = importlib.util.spec_from_file_location(
+    'home_schema', os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'data_pipeline', 'schema.py'))
+schema = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(schema)
+READING_COLUMNS, migrate, reading_values = schema.READING_COLUMNS, schema.migrate, schema.reading_values
+
+# Smart home sensor_data at v3: readings only in the JSON blob, no typed columns yet
+V3_DDL = """
+    CREATE TABLE sensor_data (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        timestamp TEXT,
+        device TEXT,
+        readings TEXT,
+        tenant_id TEXT DEFAULT 'demo',
+        ts INTEGER
+    )
+"""
+TYPED = ", ".join(READING_COLUMNS)
+
+
+def _v3_db(readings):
+    conn = sqlite3.connect(':memory:')
+    conn.execute(V3_DDL)
+    conn.executemany("INSERT INTO sensor_data (timestamp, device, readings, ts) VALUES ('2024-05-01T12:00:00', 'd', ?, 1)",
+                     [(r if r is None or isinstance(r, str) else json.dumps(r),) for r in readings])
+    conn.execute("PRAGMA user_version = 3")
+    conn.commit()
+    return conn
+
+
+def test_v4_backfills_typed_columns_from_readings():
+    conn = _v3_db([{'smoke_ppm': 3.5, 'alarm': False}, 'not json', None,
+                   {'temp_C': 21, 'state': 'open', 'motion_detected': True, 'extra': 1}] * 3)
+    migrate(conn, batch_size=2)
+
+    assert conn.execute("PRAGMA user_version").fetchone()[0] == 4
+    rows = conn.execute(f"SELECT {TYPED} FROM sensor_data ORDER BY id").fetchall()
+    blank = (None,) * len(READING_COLUMNS)
+    smoke = reading_values({'smoke_ppm': 3.5, 'alarm': False})
+    temp = reading_values({'temp_C': 21, 'state': 'open', 'motion_detected': True})
+    # SQL backfill and the ingest path agree; rows without valid JSON stay NULL
+    assert rows == [smoke, blank, blank, temp] * 3
+
+
+def test_readings_trigger_fills_typed_columns_for_blob_only_writers():
+    conn = _v3_db([])
+    migrate(conn)
+    conn.execute("INSERT INTO sensor_data (timestamp, device, readings) VALUES ('2024-05-01T12:00:00', 'd', ?)",
+                 (json.dumps({'leak_detected': True, 'moisture_percent': 80}),))
+    # A writer that sends typed values is left alone
+    conn.execute("INSERT INTO sensor_data (timestamp, device, readings, leak_detected) VALUES ('2024-05-01T12:00:00', 'd', ?, 0)",
+                 (json.dumps({'leak_detected': True}),))
+    rows = conn.execute("SELECT leak_detected, moisture_percent, ts FROM sensor_data ORDER BY id").fetchall()
+    assert rows == [(1, 80.0, 1714564800000), (0, None, 1714564800000)]
+
+
+@pytest.mark.parametrize('readings, expected', [
+    ({'smoke_ppm': 'n/a', 'temp_C': '21.5'}, {'smoke_ppm': None, 'temp_C': 21.5}),
+    ({'alarm': 'false', 'leak_detected': 'TRUE', 'motion_detected': 'maybe'},
+     {'alarm': 0, 'leak_detected': 1, 'motion_detected': None}),
+    ({'alarm': True, 'leak_detected': 0, 'motion_detected': float('nan')},
+     {'alarm': 1, 'leak_detected': 0, 'motion_detected': None}),
+    ({'humidity_percent': [1], 'state': 3}, {'humidity_percent': None, 'state': '3'}),
+])
+def test_reading_values_coerces_each_field(readings, expected):
+    values = dict(zip(READING_COLUMNS, reading_values(readings)))
+    assert {k: values[k] for k in expected} == expected
+    assert all(values[k] is None for k in READING_COLUMNS if k not in expected)
@@ -0,0 +1,66 @@
+# smart_energy/data_pipeline/benchmark_ingest.py
+# to_sql vs COPY loading of simulated meters into energy_readings (PostgreSQL)
+import os
+import time
+import argparse
+from sqlalchemy import create_engine, text
+
+from simulate_meters import simulate_many_meters
+from ingest_to_db import DB_URL, LOAD_WORKERS, bulk_load, ensure_table, ingest
+
+SAMPLES_PER_DAY = 288  # 5-minute readings
+
+def make_input(rows, out_dir, fmt):
+    """Simulate roughly `rows` readings (7 days per meter) and return the path the loaders take."""
+    days = 7
+    n_meters = max(1, rows // (days * SAMPLES_PER_DAY))
+    simulate_many_meters(output_dir=out_dir, n_meters=n_meters, days=days, fmt=fmt)
+    return os.path.join(out_dir, "meters" if fmt == "parquet" else "meters.csv")
+
+def reset(engine):
+    ensure_table(engine)
+    with engine.begin() as conn:
+        conn.execute(text("TRUNCATE energy_readings;"))
+
+def count(engine):
+    with engine.connect() as conn:
+        return conn.execute(text("SELECT count(*) FROM energy_readings;")).scalar()
+
+def run(rows, out_dir, fmt="csv", db_url=DB_URL, workers=LOAD_WORKERS, legacy_max=None):
+    path = make_input(rows, out_dir, fmt)
+    engine = create_engine(db_url)
+    methods = [
+        ("copy", lambda: bulk_load([path], db_url, workers=workers, upsert=False)),
+        ("copy + deferred indexes", lambda: bulk_load([path], db_url, workers=workers, defer_indexes=True,
+                                                      upsert=False)),
+        ("copy + upsert", lambda: bulk_load([path], db_url, workers=workers, upsert=True)),
+    ]
+    if legacy_max is None or rows <= legacy_max:
+        methods.insert(0, ("to_sql", lambda: ingest(path, db_url, upsert=False)))
+
+    results = {}
+    for name, load in methods:
+        reset(engine)
+        start = time.perf_counter()
+        load()
+        elapsed = time.perf_counter() - start
+        loaded = count(engine)
+        results[name] = elapsed
+        print(f"{name:<24} {loaded:>11,} rows in {elapsed:8.1f}s ({loaded / elapsed:,.0f} rows/s)")
+    if "to_sql" in results:
+        for name, elapsed in results.items():
+            if name != "to_sql":
+                print(f"{name} is {results['to_sql'] / elapsed:.1f}x faster than to_sql")
+    reset(engine)
+    return results
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark energy_readings loaders (to_sql vs COPY).")
+    parser.add_argument("--rows", type=int, default=10_000_000)
+    parser.add_argument("--out", default="benchmark_energy")
+    parser.add_argument("--format", choices=["csv", "parquet"], default="csv",
+                        help="parquet loads one date partition per worker")
+    parser.add_argument("--workers", type=int, default=LOAD_WORKERS)
+    parser.add_argument("--legacy-max", type=int, help="Skip the slow to_sql path above this many rows")
+    args = parser.parse_args()
+    run(args.rows, args.out, args.format, workers=args.workers, legacy_max=args.legacy_max)
@@ -4,77 +4,262 @@ import pandas as pd
 from datetime import datetime, timedelta
 import os
 import json
+import shutil
 import argparse
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 
 np.random.seed(42)
 
+CHUNK_METERS = 2000  # Meters per worker task; also the unit of output, so memory stays bounded
+READING_COLUMNS = ["consumption_kwh", "voltage", "frequency_hz"]
+
 METER_TYPES = {
     "residential": {"base_kwh": 0.3, "std": 0.1},
     "commercial": {"base_kwh": 2.0, "std": 0.8},
     "industrial": {"base_kwh": 10.0, "std": 3.0}
 }
 
-def generate_meter_series(meter_id, meter_type, start, n_samples, freq_minutes=5):
-    timestamps = [start + timedelta(minutes=i*freq_minutes) for i in range(n_samples)]
-    cfg = METER_TYPES[meter_type]
-    base = cfg["base_kwh"]
-    noise = cfg["std"]
+def generate_meter_block(meter_types, hours, rng, anomaly_rate=0.005):
+    """
+    Simulated readings for many meters at once.
+    meter_types: one METER_TYPES key per meter; hours: shared hour-of-day vector.
+    Returns 2-D (meters x samples) consumption, voltage, frequency and the anomaly mask.
+    """
+    n, s = len(meter_types), len(hours)
+    base = np.array([METER_TYPES[t]["base_kwh"] for t in meter_types])[:, None]
+    noise = np.array([METER_TYPES[t]["std"] for t in meter_types])[:, None]
 
-    # Simulate diurnal pattern (sine) + random noise + occasional spikes
-    hours = np.array([ts.hour + ts.minute/60.0 for ts in timestamps])
     diurnal = 1 + 0.5 * np.sin((hours - 6) / 24 * 2 * np.pi)  # peak around evening
-    values = base * diurnal + np.random.normal(0, noise, n_samples)
-
-    # occasional anomalies
-    n_anom = max(1, int(0.005 * n_samples))
-    anom_indices = np.random.choice(n_samples, n_anom, replace=False)
-    for idx in anom_indices:
-        if np.random.rand() < 0.6:
-            values[idx] *= (1 + np.random.uniform(2.0, 6.0))  # spike
-        else:
-            values[idx] *= np.random.uniform(0.0, 0.2)  # drop / outage
+    values = base * diurnal + rng.standard_normal((n, s)) * noise
+
+    if anomaly_rate * s >= 1:
+        # occasional anomalies: n_anom distinct samples per meter, spike or drop
+        n_anom = int(anomaly_rate * s)
+        rows = np.arange(n)[:, None]
+        idx = np.argpartition(rng.random((n, s)), n_anom - 1, axis=1)[:, :n_anom]
+        spike = rng.random((n, n_anom)) < 0.6
+        values[rows, idx] *= np.where(spike, 1 + rng.uniform(2.0, 6.0, (n, n_anom)), rng.uniform(0.0, 0.2, (n, n_anom)))
+        mask = np.zeros((n, s), dtype=bool)
+        mask[rows, idx] = True
+    else:
+        # Short (incremental) blocks: each sample is an anomaly with probability anomaly_rate,
+        # rather than forcing one into every meter's handful of new samples
+        mask = rng.random((n, s)) < anomaly_rate
+        spike = rng.random(int(mask.sum())) < 0.6
+        values[mask] *= np.where(spike, 1 + rng.uniform(2.0, 6.0, len(spike)), rng.uniform(0.0, 0.2, len(spike)))
 
+    voltage = 230 + rng.normal(0, 2, (n, s))
+    frequency = 50 + rng.normal(0, 0.05, (n, s))
+    return values, voltage, frequency, mask
+
+def _simulate_chunk(meter_ids, meter_types, timestamps, seed_seq, label_anomalies):
+    """Worker: one chunk of meters as a long (meter-major) DataFrame."""
+    rng = np.random.default_rng(seed_seq)
+    ts = pd.DatetimeIndex(timestamps)
+    hours = (ts.hour + ts.minute / 60.0).to_numpy()
+    values, voltage, frequency, mask = generate_meter_block(meter_types, hours, rng)
+    s = len(ts)
+    # Categoricals: repeating string ids per sample is what makes building and pickling chunks slow
+    type_names = list(METER_TYPES.keys())
+    type_codes = np.array([type_names.index(t) for t in meter_types])
     df = pd.DataFrame({
-        "timestamp": timestamps,
-        "meter_id": meter_id,
-        "meter_type": meter_type,
-        "consumption_kwh": values,
-        "voltage": 230 + np.random.normal(0, 2, n_samples),
-        "frequency_hz": 50 + np.random.normal(0, 0.05, n_samples)
+        "timestamp": np.tile(timestamps, len(meter_ids)),
+        "meter_id": pd.Categorical.from_codes(np.repeat(np.arange(len(meter_ids)), s), categories=meter_ids),
+        "meter_type": pd.Categorical.from_codes(np.repeat(type_codes, s), categories=type_names),
+        "consumption_kwh": values.ravel(),
+        "voltage": voltage.ravel(),
+        "frequency_hz": frequency.ravel()
     })
+    if label_anomalies:
+        df["is_anomaly"] = mask.ravel()
     return df
 
+def fleet(n_meters, seed=42):
+    """Meter ids and types; they depend only on (n_meters, seed), so every run sees the same fleet."""
+    types_seq, _ = np.random.SeedSequence(seed).spawn(2)
+    meter_ids = np.array([f"meter_{i:04d}" for i in range(n_meters)])
+    types = np.random.default_rng(types_seq).choice(list(METER_TYPES.keys()), size=n_meters, p=[0.7, 0.2, 0.1])
+    return meter_ids, types
+
+def iter_meter_chunks(start, n_meters, n_samples, freq_minutes=5, seed=42, workers=None,
+                      chunk_meters=CHUNK_METERS, label_anomalies=False, meters=None, run_key=None):
+    """
+    Yield the simulated meters chunk by chunk (in meter order).
+    Each chunk draws from its own SeedSequence child, so the output depends
+    only on seed and chunk_meters, never on the number of workers.
+    meters: positions of the fleet to simulate (default all); run_key: extra
+    entropy for the readings so repeated incremental runs do not replay the same
+    noise. With a run_key each chunk's child is keyed by its first fleet
+    position, so separate calls in one run (one per start group) never share a stream.
+    """
+    timestamps = pd.date_range(start, periods=n_samples, freq=f"{freq_minutes}min").to_numpy()
+    meter_ids, types = fleet(n_meters, seed)
+    positions = np.arange(n_meters)
+    if meters is not None:
+        meter_ids, types, positions = meter_ids[meters], types[meters], positions[meters]
+        n_meters = len(meter_ids)
+
+    starts = range(0, n_meters, chunk_meters)
+    if run_key is None:
+        _, chunks_seq = np.random.SeedSequence(seed).spawn(2)
+        seeds = chunks_seq.spawn(len(starts))
+    else:
+        seeds = [np.random.SeedSequence([seed, run_key, int(positions[i])]) for i in starts]
+    tasks = ((meter_ids[i:i + chunk_meters], types[i:i + chunk_meters], timestamps, seeds[k], label_anomalies)
+             for k, i in enumerate(starts))
+    if workers == 1:
+        for task in tasks:
+            yield _simulate_chunk(*task)
+        return
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        # Bounded number of chunks in flight so memory stays flat for any fleet size
+        pending = deque()
+        for task in tasks:
+            pending.append(pool.submit(_simulate_chunk, *task))
+            if len(pending) >= 2 * (workers or os.cpu_count() or 1):
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+def write_parquet_chunk(df, root, chunk_index):
+    """
+    Append one chunk to a hive-partitioned Parquet dataset: root/date=YYYY-MM-DD/meter_type=<type>/.
+    Readings are float32 and meter_id stays dictionary-encoded, so files are a fraction of the CSV size.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    df = df.astype({col: "float32" for col in READING_COLUMNS})
+    df["date"] = df["timestamp"].dt.strftime("%Y-%m-%d")
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    pq.write_to_dataset(table, root, partition_cols=["date", "meter_type"],
+                        basename_template=f"part-{chunk_index:05d}-{{i}}.parquet",
+                        existing_data_behavior="overwrite_or_ignore", compression="zstd")
+
 def generate_weather_series(start, n_samples, freq_minutes=5):
-    timestamps = [start + timedelta(minutes=i*freq_minutes) for i in range(n_samples)]
+    timestamps = pd.date_range(start, periods=n_samples, freq=f"{freq_minutes}min")
     # basic temp + wind
     temp = 15 + 10 * np.sin(np.linspace(0, 2*np.pi, n_samples)) + np.random.normal(0, 1, n_samples)
     wind = 3 + np.abs(np.random.normal(2, 1, n_samples))
     df = pd.DataFrame({"timestamp": timestamps, "temp_C": temp, "wind_m_s": wind})
     return df
 
-def simulate_many_meters(output_dir="smart_energy/data_pipeline/simulated_energy", n_meters=200, days=1, freq_minutes=5):
+def write_meters(chunks, meters_path, fmt="csv"):
+    """Write chunks to meters.csv or the Parquet dataset, replacing what a previous run left there."""
+    if fmt == "parquet" and os.path.isdir(meters_path):
+        shutil.rmtree(meters_path)  # Same overwrite semantics as meters.csv
+    rows = 0
+    for i, chunk in enumerate(chunks):
+        if fmt == "parquet":
+            write_parquet_chunk(chunk, meters_path, i)
+        else:
+            chunk.to_csv(meters_path, mode="w" if i == 0 else "a", header=i == 0, index=False)
+        rows += len(chunk)
+        print(f"Wrote chunk {i} ({rows} rows so far)")
+    if fmt == "csv" and rows == 0:
+        # An incremental run with nothing new: header only, so the loader sees an empty batch, not the last one
+        pd.DataFrame(columns=["timestamp", "meter_id", "meter_type"] + READING_COLUMNS).to_csv(meters_path, index=False)
+    return rows
+
+# ======================================================
+# Incremental mode: only the intervals since the last run
+# ======================================================
+
+def load_sim_state(path):
+    """Last emitted timestamp per meter_id, from a previous incremental run (empty if none)."""
+    if not os.path.exists(path):
+        return pd.Series(dtype="datetime64[ns]")
+    state = pd.read_csv(path, parse_dates=["last_timestamp"])
+    return state.set_index("meter_id")["last_timestamp"]
+
+def save_sim_state(path, last):
+    """Write the state atomically, so a run killed mid-write keeps the previous one."""
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp = path + ".tmp"
+    last.rename("last_timestamp").rename_axis("meter_id").reset_index().to_csv(tmp, index=False)
+    os.replace(tmp, path)
+
+def simulate_incremental(output_dir="smart_energy/data_pipeline/simulated_energy", n_meters=200, days=1, freq_minutes=5,
+                         workers=None, chunk_meters=CHUNK_METERS, seed=42, label_anomalies=False, fmt="csv",
+                         state_path=None, now=None):
+    """
+    Emit only the intervals each meter has not produced yet: from its last
+    emitted timestamp (kept in state_path) up to now, on the freq_minutes
+    grid. Meters without state, and gaps longer than `days`, get the last
+    `days` of samples, as a full run would. meters.csv / meters/ then hold just this
+    batch, so every run writes O(new samples) and the loader's
+    (meter_id, timestamp) upsert makes re-runs harmless.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    state_path = state_path or os.path.join(output_dir, "simulator_state.csv")
+    freq = pd.Timedelta(minutes=freq_minutes)
+    now = pd.Timestamp(now or datetime.now()).floor(freq)
+    earliest = now - pd.Timedelta(days=days) + freq
+
+    meter_ids, _ = fleet(n_meters, seed)
+    last = load_sim_state(state_path).reindex(meter_ids)
+    first = (last + freq).fillna(earliest).clip(lower=earliest).to_numpy()
+
+    # Meters normally share one grid, so this is one group (plus one for newly added meters)
+    groups = [(start, np.flatnonzero(first == start)) for start in np.unique(first) if start <= now]
+    run_key = int(now.timestamp())
+
+    def chunks():
+        for start, meters in groups:
+            n_samples = int((now - start) / freq) + 1
+            yield from iter_meter_chunks(start, n_meters, n_samples, freq_minutes, seed, workers,
+                                         chunk_meters, label_anomalies, meters=meters, run_key=run_key)
+
+    meters_path = os.path.join(output_dir, "meters.csv" if fmt == "csv" else "meters")
+    rows = write_meters(chunks(), meters_path, fmt)
+    if groups:
+        start = min(start for start, _ in groups)
+        generate_weather_series(start, int((now - start) / freq) + 1, freq_minutes).to_csv(
+            os.path.join(output_dir, "weather.csv"), index=False)
+    save_sim_state(state_path, pd.Series(now, index=meter_ids))
+    print(f"Saved {rows} new rows for {sum(len(m) for _, m in groups)} meters up to {now} to {meters_path}")
+    return rows
+
+def simulate_many_meters(output_dir="smart_energy/data_pipeline/simulated_energy", n_meters=200, days=1, freq_minutes=5,
+                         workers=None, chunk_meters=CHUNK_METERS, seed=42, label_anomalies=False, fmt="csv"):
+    """fmt="csv" writes meters.csv; fmt="parquet" writes the partitioned dataset meters/ (see write_parquet_chunk)."""
     os.makedirs(output_dir, exist_ok=True)
     start = datetime.now() - timedelta(days=days)
     n_samples = int((24*60 / freq_minutes) * days)
 
-    # assign meters
-    meter_ids = [f"meter_{i:04d}" for i in range(n_meters)]
-    types = np.random.choice(list(METER_TYPES.keys()), size=n_meters, p=[0.7, 0.2, 0.1])
-
-    all_dfs = []
-    for m_id, m_type in zip(meter_ids, types):
-        df = generate_meter_series(m_id, m_type, start, n_samples, freq_minutes)
-        all_dfs.append(df)
+    meters_path = os.path.join(output_dir, "meters.csv" if fmt == "csv" else "meters")
+    rows = write_meters(iter_meter_chunks(start, n_meters, n_samples, freq_minutes, seed, workers,
+                                          chunk_meters, label_anomalies), meters_path, fmt)
 
-    combined = pd.concat(all_dfs, ignore_index=True)
     weather = generate_weather_series(start, n_samples, freq_minutes)
     # Save
-    combined.to_csv(os.path.join(output_dir, "meters.csv"), index=False)
     weather.to_csv(os.path.join(output_dir, "weather.csv"), index=False)
-    meta = {"n_meters": n_meters, "days": days, "freq_minutes": freq_minutes}
+    meta = {"n_meters": n_meters, "days": days, "freq_minutes": freq_minutes, "seed": seed, "chunk_meters": chunk_meters,
+            "format": fmt}
     with open(os.path.join(output_dir, "meta.json"), "w") as f:
         json.dump(meta, f)
-    print(f"Saved meters.csv and weather.csv to {output_dir}")
+    print(f"Saved {os.path.basename(meters_path)} ({rows} rows) and weather.csv to {output_dir}")
 
 if __name__ == "__main__":
-    simulate_many_meters()
+    parser = argparse.ArgumentParser(description="Simulate smart meter readings.")
+    parser.add_argument("--output-dir", default="smart_energy/data_pipeline/simulated_energy")
+    parser.add_argument("--meters", type=int, default=200)
+    parser.add_argument("--days", type=float, default=1)
+    parser.add_argument("--freq-minutes", type=int, default=5)
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: CPU count, 1 = in-process)")
+    parser.add_argument("--chunk-meters", type=int, default=CHUNK_METERS)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--label-anomalies", action="store_true", help="Add an is_anomaly column (ground truth)")
+    parser.add_argument("--format", choices=["csv", "parquet"], default="csv",
+                        help="parquet: date/meter_type-partitioned dataset with float32 readings")
+    parser.add_argument("--incremental", action="store_true",
+                        help="Only emit the intervals since each meter's last emitted timestamp (see --state)")
+    parser.add_argument("--state", default=None,
+                        help="Incremental state file (default: <output-dir>/simulator_state.csv)")
+    args = parser.parse_args()
+    if args.incremental:
+        simulate_incremental(args.output_dir, args.meters, args.days, args.freq_minutes, args.workers,
+                             args.chunk_meters, args.seed, args.label_anomalies, args.format, args.state)
+    else:
+        simulate_many_meters(args.output_dir, args.meters, args.days, args.freq_minutes, args.workers,
+                             args.chunk_meters, args.seed, args.label_anomalies, args.format)
@@ -0,0 +1,125 @@
+# smart_energy/data_pipeline/stream_meters.py
+# Publish simulated or replayed meter readings to MQTT or Kafka, one message per reading keyed by meter_id
+import os
+import json
+import time
+import argparse
+
+import numpy as np
+import pandas as pd
+
+from simulate_meters import fleet, generate_meter_block
+from ingest_to_db import COLUMNS, iter_frames
+from stream_ingest import (MQTT_BROKER, MQTT_PORT, MQTT_TOPIC_PREFIX, MQTT_QOS, KAFKA_BOOTSTRAP_SERVERS,
+                           KAFKA_TOPIC)
+
+REPORT_INTERVAL_S = int(os.environ.get("STREAM_REPORT_INTERVAL_S", 30))
+
+class KafkaPublisher:
+    """Keyed by meter_id, so each meter's readings stay in order on one partition."""
+
+    def __init__(self, bootstrap_servers=KAFKA_BOOTSTRAP_SERVERS, topic=KAFKA_TOPIC):
+        from kafka import KafkaProducer
+        self.topic = topic
+        # linger_ms lets the client pack many small readings into each produce request
+        self.producer = KafkaProducer(bootstrap_servers=bootstrap_servers, key_serializer=str.encode,
+                                      acks=1, linger_ms=20, batch_size=256 * 1024)
+
+    def publish(self, meter_id, payload):
+        self.producer.send(self.topic, key=meter_id, value=payload)
+
+    def close(self):
+        self.producer.flush()
+        self.producer.close()
+
+class MqttPublisher:
+    """One topic per meter (<prefix>/<meter_id>), which shared subscriptions can split between consumers."""
+
+    def __init__(self, host=MQTT_BROKER, port=MQTT_PORT, prefix=MQTT_TOPIC_PREFIX, qos=MQTT_QOS):
+        import paho.mqtt.client as mqtt
+        self.prefix = prefix
+        self.qos = qos
+        self.client = mqtt.Client()
+        self.client.connect(host, port, 60)
+        self.client.loop_start()
+
+    def publish(self, meter_id, payload):
+        self.client.publish(f"{self.prefix}/{meter_id}", payload, qos=self.qos)
+
+    def close(self):
+        self.client.loop_stop()
+        self.client.disconnect()
+
+def simulated_frames(n_meters, seed=42, freq_minutes=5, start=None):
+    """
+    Endless readings for the simulate_meters fleet: one frame per interval
+    holding every meter's reading, timestamps advancing by freq_minutes.
+    """
+    meter_ids, types = fleet(n_meters, seed)
+    rng = np.random.default_rng([seed, int(time.time())])
+    freq = pd.Timedelta(minutes=freq_minutes)
+    ts = pd.Timestamp(start) if start else pd.Timestamp.now().floor(freq)
+    while True:
+        hours = np.array([ts.hour + ts.minute / 60.0])
+        values, voltage, frequency, _ = generate_meter_block(types, hours, rng)
+        yield pd.DataFrame({"timestamp": ts, "meter_id": meter_ids, "meter_type": types,
+                            "consumption_kwh": values[:, 0], "voltage": voltage[:, 0], "frequency_hz": frequency[:, 0]})
+        ts += freq
+
+def replay_frames(path):
+    """Readings from meters.csv or a Parquet dataset, each chunk in time order."""
+    for df in iter_frames(path):
+        yield df.sort_values("timestamp", kind="stable")
+
+def publish_frames(publisher, frames, rate=0, interval_s=None):
+    """
+    Publish each frame's readings, at most `rate` readings/s (0 = as fast as
+    the transport takes them). interval_s starts frames that many seconds
+    apart (simulated meters report once per interval).
+    """
+    sent, started, last_report = 0, time.time(), time.time()
+    try:
+        for df in frames:
+            frame_start = time.time()
+            df = df[COLUMNS].copy()
+            df["timestamp"] = pd.to_datetime(df["timestamp"]).dt.strftime("%Y-%m-%dT%H:%M:%S")
+            for record in df.to_dict(orient="records"):
+                publisher.publish(record["meter_id"], json.dumps(record).encode())
+                sent += 1
+                if rate and sent % 100 == 0:
+                    ahead = sent / rate - (time.time() - started)
+                    if ahead > 0:
+                        time.sleep(ahead)
+            if time.time() - last_report >= REPORT_INTERVAL_S:
+                print(f"Published {sent} readings ({sent / (time.time() - started):.0f}/s)")
+                last_report = time.time()
+            if interval_s:
+                time.sleep(max(0.0, interval_s - (time.time() - frame_start)))
+    except KeyboardInterrupt:
+        pass
+    elapsed = time.time() - started
+    print(f"Published {sent} readings in {elapsed:.1f}s ({sent / max(elapsed, 1e-9):.0f}/s)")
+    return sent
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Stream meter readings to MQTT or Kafka.")
+    parser.add_argument("--transport", choices=["mqtt", "kafka"], default="kafka")
+    parser.add_argument("--replay", help="Replay meters.csv or a Parquet dataset instead of simulating")
+    parser.add_argument("--meters", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--freq-minutes", type=int, default=5)
+    parser.add_argument("--interval-s", type=float, default=None,
+                        help="Simulated: seconds between intervals (default freq-minutes, i.e. real time)")
+    parser.add_argument("--rate", type=float, default=0, help="Max readings/s (0 = unthrottled)")
+    args = parser.parse_args()
+
+    publisher = KafkaPublisher() if args.transport == "kafka" else MqttPublisher()
+    if args.replay:
+        frames, interval_s = replay_frames(args.replay), None
+    else:
+        frames = simulated_frames(args.meters, args.seed, args.freq_minutes)
+        interval_s = args.interval_s if args.interval_s is not None else args.freq_minutes * 60
+    try:
+        publish_frames(publisher, frames, args.rate, interval_s)
+    finally:
+        publisher.close()
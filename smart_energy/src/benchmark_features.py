@@ -0,0 +1,75 @@
+# smart_energy/src/benchmark_features.py
+# groupby/rolling lambdas vs the vectorized rolling engine for forecasting features
+import time
+import argparse
+
+import numpy as np
+import pandas as pd
+
+from forecasting import create_features
+
+def make_rows(n, samples_per_meter=288, seed=42):
+    """n readings spread over n // samples_per_meter meters at 5-minute steps, rows shuffled like a DB read."""
+    rng = np.random.default_rng(seed)
+    n_meters = max(1, n // samples_per_meter)
+    n = n_meters * samples_per_meter
+    meters = np.repeat(np.arange(n_meters), samples_per_meter)
+    steps = np.tile(np.arange(samples_per_meter), n_meters)
+    df = pd.DataFrame({
+        "timestamp": pd.Timestamp("2025-01-01") + pd.to_timedelta(steps * 5, unit="min"),
+        "meter_id": pd.Categorical.from_codes(meters, [f"meter_{i:06d}" for i in range(n_meters)]),
+        "consumption_kwh": rng.gamma(2.0, 0.5, n),
+        "voltage": 230 + rng.normal(0, 2, n),
+        "frequency_hz": 50 + rng.normal(0, 0.05, n),
+    })
+    return df.iloc[rng.permutation(n)].reset_index(drop=True)
+
+def legacy_create_features(df, window=12):
+    """The previous per-meter lambda implementation of create_features, kept for comparison."""
+    df = df.sort_values(["meter_id", "timestamp"])
+    df["consumption_mean"] = df.groupby("meter_id")["consumption_kwh"].transform(lambda x: x.rolling(window).mean())
+    df["consumption_std"] = df.groupby("meter_id")["consumption_kwh"].transform(lambda x: x.rolling(window).std())
+    df["target_next"] = df.groupby("meter_id")["consumption_kwh"].shift(-1)  # predict next sample
+    df = df.dropna()
+    return df
+
+def _check(new, old):
+    """Same rows in the same order, same values up to float rounding."""
+    assert new.index.equals(old.index)
+    for col in ["consumption_mean", "consumption_std", "target_next"]:
+        np.testing.assert_allclose(new[col].to_numpy(), old[col].to_numpy(), rtol=1e-9, atol=1e-12)
+
+def run(sizes, legacy_max=1_000_000):
+    """
+    Time both paths at each size. Above legacy_max rows the lambda path runs
+    on a sample of whole meters (about legacy_max rows) and its full-size
+    time is extrapolated linearly (its cost is per meter), labelled as such.
+    """
+    for n in sizes:
+        df = make_rows(n)
+        start = time.perf_counter()
+        new = create_features(df)
+        t_new = time.perf_counter() - start
+        sample = df
+        if len(df) > legacy_max:
+            meters = df["meter_id"].cat.categories[:max(1, legacy_max * df["meter_id"].nunique() // len(df))]
+            sample = df[df["meter_id"].isin(meters)]
+            new_part = new[new["meter_id"].isin(meters)]
+        start = time.perf_counter()
+        old = legacy_create_features(sample)
+        t_old = time.perf_counter() - start
+        if sample is df:
+            _check(new, old)
+            print(f"{len(df):>11,} rows: legacy {t_old:.2f}s, vectorized {t_new:.2f}s -> {t_old / t_new:.1f}x faster")
+            continue
+        _check(new_part, old)
+        t_old *= len(df) / len(sample)
+        print(f"{len(df):>11,} rows: legacy ~{t_old:.2f}s (estimated from {len(sample):,} rows), "
+              f"vectorized {t_new:.2f}s -> ~{t_old / t_new:.1f}x faster")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark forecasting feature creation.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000_000, 50_000_000])
+    parser.add_argument("--legacy-max", type=int, default=1_000_000, help="Above this many rows, time the lambda path on a sample of meters and extrapolate")
+    args = parser.parse_args()
+    run(args.sizes, args.legacy_max)
@@ -0,0 +1,96 @@
+# smart_energy/src/data_access.py
+# Column-projected, streamed reads of energy_readings into compact frames
+import os
+import resource
+
+import numpy as np
+import pandas as pd
+from pandas.api.types import union_categoricals
+from sqlalchemy import text
+
+CHUNK_ROWS = int(os.environ.get("ENERGY_READ_CHUNK_ROWS", 100_000))  # Rows per server-side cursor fetch
+MEMORY_BUDGET_MB = int(os.environ.get("ENERGY_JOB_MEMORY_MB", 1024))  # Ceiling for one job's frame
+
+CATEGORY_COLUMNS = {"meter_id", "meter_type"}
+FLOAT32_COLUMNS = {"consumption_kwh", "voltage", "frequency_hz"}
+
+def compact(df, epoch_ms=False):
+    """Categoricals for ids, float32 readings; with epoch_ms the timestamp becomes int64 'ts' (ms)."""
+    for col in df.columns:
+        if col in CATEGORY_COLUMNS:
+            df[col] = df[col].astype("category")
+        elif col in FLOAT32_COLUMNS:
+            df[col] = df[col].astype("float32")
+    if "timestamp" in df.columns:
+        ts = pd.to_datetime(df["timestamp"])
+        if epoch_ms:
+            df["ts"] = (ts - pd.Timestamp(0)) // pd.Timedelta(milliseconds=1)
+            df = df.drop(columns="timestamp")
+        else:
+            df["timestamp"] = ts
+    return df
+
+def _concat(chunks):
+    """Concatenate compact chunks without letting categoricals fall back to object."""
+    if not chunks:
+        return pd.DataFrame()
+    out = {}
+    for col in chunks[0].columns:
+        parts = [c[col] for c in chunks]
+        if isinstance(parts[0].dtype, pd.CategoricalDtype):
+            out[col] = pd.Series(union_categoricals(parts), name=col)
+        else:
+            out[col] = pd.Series(np.concatenate([p.to_numpy() for p in parts]), name=col)
+    return pd.DataFrame(out)
+
+def peak_rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024  # KiB on Linux
+
+def iter_readings(engine, columns, where="", params=None, chunk_rows=CHUNK_ROWS, epoch_ms=False, order_by=None):
+    """
+    Stream SELECT <columns> FROM energy_readings [WHERE ...] through a
+    server-side cursor, chunk_rows at a time, yielding compact frames.
+    """
+    sql = f"SELECT {', '.join(columns)} FROM energy_readings"
+    if where:
+        sql += f" WHERE {where}"
+    if order_by:
+        sql += f" ORDER BY {order_by}"
+    with engine.connect().execution_options(stream_results=True, max_row_buffer=chunk_rows) as conn:
+        for chunk in pd.read_sql(text(sql), conn, params=params or {}, chunksize=chunk_rows):
+            yield compact(chunk, epoch_ms)
+
+def _sample_mask(chunk, stride):
+    """Rows to keep at 1/stride: whole meters (stable hash of meter_id), so each kept series stays contiguous."""
+    if "meter_id" in chunk.columns:
+        return pd.util.hash_pandas_object(chunk["meter_id"], index=False).to_numpy() % stride == 0
+    return chunk.index.to_numpy() % stride == 0
+
+def read_readings(engine, columns, where="", params=None, job="read", budget_mb=MEMORY_BUDGET_MB,
+                  chunk_rows=CHUNK_ROWS, epoch_ms=False, order_by=None):
+    """
+    iter_readings gathered into one compact frame of at most budget_mb.
+    When the window does not fit, whole meters are dropped: 1 in 2, then
+    1 in 4, ..., which keeps a uniform sample of the fleet for training.
+    budget_mb=None never samples (for reads that must see every row).
+    Prints the job's rows, frame size and peak RSS; returns the frame.
+    """
+    budget = budget_mb * 1024 * 1024 if budget_mb else None
+    chunks, size, stride, rows_read = [], 0, 1, 0
+    for chunk in iter_readings(engine, columns, where, params, chunk_rows, epoch_ms, order_by):
+        chunk.index = pd.RangeIndex(rows_read, rows_read + len(chunk))
+        rows_read += len(chunk)
+        if stride > 1:
+            chunk = chunk[_sample_mask(chunk, stride)]
+        chunks.append(chunk)
+        size += chunk.memory_usage(deep=True).sum()
+        while budget and size > budget and stride < rows_read:
+            stride *= 2  # Powers of two: the meters kept at 1/2k are a subset of those kept at 1/k
+            chunks = [c[_sample_mask(c, stride)] for c in chunks]
+            size = sum(c.memory_usage(deep=True).sum() for c in chunks)
+    df = _concat(chunks) if chunks else pd.DataFrame(columns=columns)
+    sampled = f", sampled 1/{stride} of meters" if stride > 1 else ""
+    limit = f" (budget {budget_mb} MB)" if budget_mb else ""
+    print(f"[{job}] {rows_read} rows read, {len(df)} kept{sampled}: "
+          f"{df.memory_usage(deep=True).sum() / 2**20:.0f} MB frame{limit}, peak RSS {peak_rss_mb():.0f} MB")
+    return df
@@ -0,0 +1,67 @@
+# smart_energy/src/model_store.py
+# Versioned on-disk models: <root>/v0001/{model.joblib,meta.json}, a LATEST pointer and history.jsonl
+import os
+import json
+import shutil
+import joblib
+from datetime import datetime
+
+KEEP_VERSIONS = int(os.environ.get("MODEL_KEEP_VERSIONS", 5))
+
+def list_versions(root):
+    if not os.path.isdir(root):
+        return []
+    return sorted(int(d[1:]) for d in os.listdir(root) if d.startswith("v") and d[1:].isdigit())
+
+def latest_version(root):
+    try:
+        with open(os.path.join(root, "LATEST")) as f:
+            return int(f.read().strip())
+    except (OSError, ValueError):
+        versions = list_versions(root)
+        return versions[-1] if versions else None
+
+def save_version(root, model, meta, keep=KEEP_VERSIONS):
+    """
+    Write model + meta as the next version and point LATEST at it. The version
+    directory is renamed into place and LATEST replaced atomically, so a reader
+    never sees a half-written model. Only the newest `keep` versions are kept;
+    every version's meta is also appended to history.jsonl for tracking.
+    """
+    os.makedirs(root, exist_ok=True)
+    versions = list_versions(root)
+    version = (versions[-1] if versions else 0) + 1
+    meta = dict(meta, version=version, saved_at=datetime.now().isoformat())
+    tmp = os.path.join(root, f".tmp-v{version:04d}")
+    shutil.rmtree(tmp, ignore_errors=True)
+    os.makedirs(tmp)
+    joblib.dump(model, os.path.join(tmp, "model.joblib"))
+    with open(os.path.join(tmp, "meta.json"), "w") as f:
+        json.dump(meta, f, indent=2, default=str)
+    os.rename(tmp, os.path.join(root, f"v{version:04d}"))
+    with open(os.path.join(root, "LATEST.tmp"), "w") as f:
+        f.write(str(version))
+    os.replace(os.path.join(root, "LATEST.tmp"), os.path.join(root, "LATEST"))
+    with open(os.path.join(root, "history.jsonl"), "a") as f:
+        f.write(json.dumps(meta, default=str) + "\n")
+    for old in list_versions(root)[:-keep]:
+        shutil.rmtree(os.path.join(root, f"v{old:04d}"), ignore_errors=True)
+    return version
+
+def load_version(root, version=None):
+    """(model, meta) for version (default LATEST), or (None, None) if there is none."""
+    version = version or latest_version(root)
+    if version is None:
+        return None, None
+    path = os.path.join(root, f"v{version:04d}")
+    with open(os.path.join(path, "meta.json")) as f:
+        meta = json.load(f)
+    return joblib.load(os.path.join(path, "model.joblib")), meta
+
+def history(root):
+    """Meta of every version ever saved, oldest first."""
+    try:
+        with open(os.path.join(root, "history.jsonl")) as f:
+            return [json.loads(line) for line in f if line.strip()]
+    except OSError:
+        return []
@@ -0,0 +1,222 @@
+# smart_energy/src/online_detector.py
+# Streaming anomaly detector: O(1) per reading, per-meter state in flat NumPy arrays
+import os
+import sys
+import time
+import argparse
+
+import numpy as np
+import pandas as pd
+
+SLOTS = int(os.environ.get("ONLINE_SLOTS", 24))  # Time-of-day baseline buckets per meter (24 = hourly)
+ALPHA = float(os.environ.get("ONLINE_ALPHA", 0.05))  # EWMA weight of residual mean/variance
+BASELINE_ALPHA = float(os.environ.get("ONLINE_BASELINE_ALPHA", 0.1))  # EWMA weight of each time-of-day baseline
+THRESHOLD = float(os.environ.get("ONLINE_Z_THRESHOLD", 4.0))  # |z| above this is flagged
+WARMUP = int(os.environ.get("ONLINE_WARMUP", 48))  # Readings per meter before it can be flagged
+OUTAGE_AFTER_S = int(os.environ.get("ONLINE_OUTAGE_AFTER_S", 900))  # Silent this long behind the fleet = outage
+STATE_PATH = os.environ.get("ONLINE_DETECTOR_STATE", "models/online_detector.npz")
+
+class OnlineDetector:
+    """
+    Per meter: a time-of-day baseline (SLOTS buckets) and an EWMA mean and
+    variance of the reading's residual from that baseline. A reading is
+    scored by the z-score of its residual before it updates the state, so
+    each reading costs O(1) and state is a fixed ~(29 + 4 * SLOTS) bytes per
+    meter: rows of flat arrays indexed by meter number, grown by doubling.
+    Updates are clipped at the threshold, so a spike is flagged without
+    dragging the baseline after it, while a lasting level change is still
+    learned. Meters are only flagged after `warmup` readings.
+    Non-finite readings (NaN, inf) are not scored and leave the state as it
+    was. Each meter's last reading time is kept, so stale() can report
+    meters that stopped reporting (outages) in one vectorized sweep.
+    """
+
+    def __init__(self, slots=SLOTS, alpha=ALPHA, baseline_alpha=BASELINE_ALPHA, threshold=THRESHOLD, warmup=WARMUP,
+                 capacity=1024):
+        self.slots = slots
+        self.alpha = alpha
+        self.baseline_alpha = baseline_alpha
+        self.threshold = threshold
+        self.warmup = warmup
+        self.ids = []
+        self._index = None  # pd.Index over ids for batch lookups, rebuilt when meters are added
+        self._allocate(capacity)
+
+    def _allocate(self, capacity):
+        mean, var = np.zeros(capacity), np.zeros(capacity)
+        count = np.zeros(capacity, dtype=np.int32)
+        baseline = np.full((capacity, self.slots), np.nan, dtype=np.float32)  # NaN = slot not seen yet
+        last_seen = np.zeros(capacity, dtype=np.int64)  # Epoch ns of the last finite reading, 0 = none
+        out = np.zeros(capacity, dtype=bool)  # Outage already reported by stale()
+        if hasattr(self, "mean"):
+            n = len(self.mean)
+            mean[:n], var[:n], count[:n], baseline[:n] = self.mean[:n], self.var[:n], self.count[:n], self.baseline[:n]
+            last_seen[:n], out[:n] = self.last_seen[:n], self.out[:n]
+        self.mean, self.var, self.count, self.baseline = mean, var, count, baseline
+        self.last_seen, self.out = last_seen, out
+
+    def __len__(self):
+        return len(self.ids)
+
+    def _meter_numbers(self, meter_ids):
+        """Row of each meter id, registering unseen meters."""
+        meter_ids = pd.Index(meter_ids)
+        rows = self._index.get_indexer(meter_ids) if self._index is not None else np.full(len(meter_ids), -1)
+        if (rows < 0).any():
+            self.ids.extend(meter_ids[rows < 0].unique())
+            if len(self.ids) > len(self.mean):
+                self._allocate(max(len(self.ids), 2 * len(self.mean)))
+            self._index = pd.Index(self.ids)
+            rows = self._index.get_indexer(meter_ids)
+        return rows
+
+    def slot(self, timestamps):
+        ts = pd.DatetimeIndex(timestamps)
+        return ((ts.hour * 60 + ts.minute) * self.slots // (24 * 60)).to_numpy()
+
+    def _update(self, rows, slots, values):
+        """Score and learn one reading for each of `rows` (distinct meters), all at once."""
+        b = self.baseline[rows, slots].astype(np.float64)
+        b = np.where(np.isnan(b), values, b)  # First reading in a slot sets its baseline
+        residual = values - b
+        mean, var = self.mean[rows], self.var[rows]
+        std = np.sqrt(var + (1e-3 * np.abs(b)) ** 2 + 1e-12)  # Floor so a flat meter does not divide by ~0
+        ready = self.count[rows] >= self.warmup
+        z = np.where(ready, (residual - mean) / std, 0.0)
+        clipped = np.where(ready, mean + np.clip(z, -self.threshold, self.threshold) * std, residual)
+        diff = clipped - mean
+        self.mean[rows] = mean + self.alpha * diff
+        self.var[rows] = (1 - self.alpha) * (var + self.alpha * diff ** 2)
+        self.baseline[rows, slots] = b + self.baseline_alpha * (clipped - mean)
+        self.count[rows] += 1
+        return z
+
+    def score_batch(self, meter_ids, timestamps, values):
+        """
+        z-scores for a micro-batch, updating state as if the readings came
+        one by one in time order. Vectorized across meters; a meter with k
+        readings in the batch takes k passes, so a batch costs O(rows).
+        Readings with a non-finite value or no timestamp get z = 0 and are
+        skipped. Returns (z, flagged).
+        """
+        rows = self._meter_numbers(meter_ids)
+        ts = pd.DatetimeIndex(timestamps).as_unit("ns")
+        values = np.asarray(values, dtype=np.float64)
+        z = np.zeros(len(values))
+        valid = np.isfinite(values) & ~ts.isna()
+        if not valid.all():
+            rows, ts, values = rows[valid], ts[valid], values[valid]
+        slots = self.slot(ts)
+        ns = ts.asi8
+        n = len(values)
+        if n:
+            np.maximum.at(self.last_seen, rows, ns)
+            self.out[rows] = False
+            order = np.lexsort((ns, rows))
+            sorted_rows = rows[order]
+            starts = np.r_[True, sorted_rows[1:] != sorted_rows[:-1]]
+            rank = np.arange(n) - np.maximum.accumulate(np.where(starts, np.arange(n), 0))
+            scored = np.zeros(n)
+            for k in range(rank.max() + 1):
+                pick = order[rank == k]
+                scored[pick] = self._update(rows[pick], slots[pick], values[pick])
+            z[valid] = scored
+        return z, np.abs(z) > self.threshold
+
+    def score(self, meter_id, timestamp, value):
+        """One reading: (z, flagged)."""
+        z, flagged = self.score_batch([meter_id], [timestamp], [value])
+        return float(z[0]), bool(flagged[0])
+
+    def stale(self, max_gap_s=OUTAGE_AFTER_S, now=None):
+        """
+        Meters whose last reading is more than max_gap_s behind `now` (default:
+        the newest reading of any meter, so pipeline lag is not mistaken for
+        outages) -> DataFrame (meter_id, last_seen). Each outage is reported
+        once, until the meter reports again.
+        """
+        n = len(self.ids)
+        last = self.last_seen[:n]
+        seen = last > 0
+        if not seen.any():
+            return pd.DataFrame({"meter_id": [], "last_seen": pd.DatetimeIndex([])})
+        now = last[seen].max() if now is None else pd.Timestamp(now).value
+        new = seen & ~self.out[:n] & (last < now - int(max_gap_s * 1e9))
+        self.out[:n] |= new
+        return pd.DataFrame({"meter_id": np.array(self.ids, dtype=object)[new],
+                             "last_seen": pd.to_datetime(last[new])})
+
+    def nbytes(self):
+        n = len(self.ids)
+        return n * (self.mean.itemsize + self.var.itemsize + self.count.itemsize + self.slots * self.baseline.itemsize
+                    + self.last_seen.itemsize + self.out.itemsize)
+
+    # -------- Persistence --------
+    def save(self, path=STATE_PATH):
+        """Write the state atomically (tmp file + rename)."""
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        n = len(self.ids)
+        tmp = path + ".tmp.npz"
+        np.savez(tmp, ids=np.array(self.ids, dtype=str), mean=self.mean[:n], var=self.var[:n], count=self.count[:n],
+                 baseline=self.baseline[:n], last_seen=self.last_seen[:n], out=self.out[:n],
+                 params=np.array([self.slots, self.alpha, self.baseline_alpha, self.threshold, self.warmup]))
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path=STATE_PATH, **params):
+        """Restore a saved detector; a fresh one (with **params) if there is no state file."""
+        if not os.path.exists(path):
+            return cls(**params)
+        with np.load(path) as state:
+            slots, alpha, baseline_alpha, threshold, warmup = state["params"]
+            params = dict(dict(slots=int(slots), alpha=alpha, baseline_alpha=baseline_alpha, threshold=threshold,
+                               warmup=int(warmup)), **params)
+            if params["slots"] != int(slots):
+                raise ValueError(f"{path} has {int(slots)} time-of-day slots, not {params['slots']}")
+            ids = state["ids"].tolist()
+            detector = cls(capacity=max(len(ids), 1024), **params)
+            n = len(ids)
+            detector.mean[:n], detector.var[:n], detector.count[:n] = state["mean"], state["var"], state["count"]
+            detector.baseline[:n] = state["baseline"]
+            if "last_seen" in state:  # Older state files have no outage tracking
+                detector.last_seen[:n], detector.out[:n] = state["last_seen"], state["out"]
+        detector.ids = ids
+        detector._index = pd.Index(ids) if ids else None
+        return detector
+
+# ======================================================
+# Evaluation / benchmark on simulated meters
+# ======================================================
+
+def evaluate(n_meters=2000, days=3, freq_minutes=5, seed=42):
+    """Stream simulated meters one interval at a time; report throughput, state size and precision/recall."""
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "data_pipeline"))
+    from simulate_meters import iter_meter_chunks
+    n_samples = int(24 * 60 / freq_minutes * days)
+    start = pd.Timestamp.now().floor("D") - pd.Timedelta(days=days)
+    df = pd.concat(iter_meter_chunks(start, n_meters, n_samples, freq_minutes, seed, workers=1,
+                                     label_anomalies=True), ignore_index=True)
+    detector = OnlineDetector()
+    flagged = np.zeros(len(df), dtype=bool)
+    seconds = 0.0
+    for _, rows in df.groupby("timestamp", sort=True).indices.items():
+        batch = df.iloc[rows]
+        began = time.perf_counter()
+        _, flagged[rows] = detector.score_batch(batch["meter_id"].to_numpy(), batch["timestamp"],
+                                                batch["consumption_kwh"].to_numpy())
+        seconds += time.perf_counter() - began
+    scored = df.groupby("meter_id", observed=True).cumcount().to_numpy() >= detector.warmup
+    truth = df["is_anomaly"].to_numpy() & scored
+    hits = (flagged & truth).sum()
+    print(f"{len(df)} readings for {n_meters} meters in {seconds:.2f}s ({len(df) / seconds:,.0f} readings/s), "
+          f"state {detector.nbytes() / 2**20:.1f} MB")
+    print(f"After warmup: precision {hits / max(flagged.sum(), 1):.2f}, recall {hits / max(truth.sum(), 1):.2f}, "
+          f"false positive rate {(flagged & ~truth & scored).sum() / max((~truth & scored).sum(), 1):.4f}")
+    return detector
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Evaluate the online detector on simulated meters.")
+    parser.add_argument("--meters", type=int, default=2000)
+    parser.add_argument("--days", type=float, default=3)
+    args = parser.parse_args()
+    evaluate(args.meters, args.days)
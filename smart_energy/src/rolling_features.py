@@ -0,0 +1,92 @@
+# smart_energy/src/rolling_features.py
+# Per-meter rolling mean/std and lag features for all meters in one vectorized pass
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+
+BLOCK_ROWS = 1 << 20  # Windows materialised per step (x window x 8 bytes of scratch)
+
+def sort_order(df, key="meter_id", time_col="timestamp"):
+    """Positions that sort df by (key, time) stably, same as df.sort_values([key, time_col])."""
+    codes, _ = pd.factorize(df[key], sort=True)
+    times, _ = pd.factorize(df[time_col], sort=True)
+    n = len(df)
+    span = (int(codes.max()) + 1) * (int(times.max()) + 1) if n else 0
+    if span * n >= 2 ** 62:  # Composite key would overflow: plain (slower) multi-key sort
+        keys = pd.DataFrame({"key": codes, "time": times})
+        return keys.sort_values(["key", "time"]).index.to_numpy(), codes
+    # One int64 key per row, with the row position as tie-breaker, so the fast
+    # unstable argsort still gives exactly the stable (key, time) order
+    composite = (codes.astype(np.int64) * (int(times.max()) + 1) + times) * n + np.arange(n)
+    return np.argsort(composite), codes
+
+def _segments(sorted_codes):
+    """Position of each row inside its meter's run, and that run's start and length, per row."""
+    n = len(sorted_codes)
+    starts = np.flatnonzero(np.r_[True, sorted_codes[1:] != sorted_codes[:-1]]) if n else np.array([], dtype=np.int64)
+    lengths = np.diff(np.r_[starts, n])
+    run_start = np.repeat(starts, lengths)
+    return np.arange(n) - run_start, run_start, np.repeat(lengths, lengths)
+
+def rolling_stats(values, pos, window, block_rows=BLOCK_ROWS):
+    """
+    Trailing rolling mean and std (ddof=1) over meter-sorted values, matching
+    groupby().rolling(window) with min_periods=window: NaN for a meter's first
+    window-1 rows and for any window holding a NaN. Works on a strided
+    (rows x window) view of the array, block_rows windows at a time, with a
+    two-pass mean/deviation per window so the std stays exact.
+    """
+    values = np.asarray(values, dtype="float64")
+    n = len(values)
+    mean = np.full(n, np.nan)
+    std = np.full(n, np.nan)
+    if n < window:
+        return mean, std
+    windows = sliding_window_view(values, window)  # Row j covers values[j:j + window]; no copy
+    for start in range(0, len(windows), block_rows):
+        block = windows[start:start + block_rows]
+        end = start + window - 1  # Each window's result belongs to its last row
+        m = block.mean(axis=1)
+        mean[end:end + len(block)] = m
+        if window > 1:  # Sample std of one value is undefined, as in pandas
+            std[end:end + len(block)] = np.sqrt(((block - m[:, None]) ** 2).sum(axis=1) / (window - 1))
+    short = pos < window - 1  # Window would reach back into the previous meter
+    mean[short] = np.nan
+    std[short] = np.nan
+    return mean, std
+
+def shifted(values, pos, run_len, periods):
+    """groupby().shift(periods) on meter-sorted values: positive = lag, negative = lead."""
+    values = np.asarray(values, dtype="float64")
+    out = np.full(len(values), np.nan)
+    idx = np.arange(len(values))
+    ok = pos >= periods if periods >= 0 else pos < run_len + periods
+    out[ok] = values[idx[ok] - periods]
+    return out
+
+def rolling_features(df, value_col="consumption_kwh", prefix="consumption", window=12, lags=(), lead=None,
+                     key="meter_id", time_col="timestamp"):
+    """
+    df sorted by (key, time) with {prefix}_mean / {prefix}_std over `window`
+    rows, {prefix}_lag_{k} for each k in lags and, with lead=k, target_next
+    (the value k rows ahead). One sort plus O(n) numpy work for any number
+    of meters, instead of one Python call per meter.
+    """
+    order, codes = sort_order(df, key, time_col)
+    out = df.iloc[order].copy()
+    pos, run_start, run_len = _segments(codes[order])
+    values = out[value_col].to_numpy(dtype="float64")
+    out[f"{prefix}_mean"], out[f"{prefix}_std"] = rolling_stats(values, pos, window)
+    for k in lags:
+        out[f"{prefix}_lag_{k}"] = shifted(values, pos, run_len, k)
+    if lead:
+        out["target_next"] = shifted(values, pos, run_len, -lead)
+    return out
+
+def with_target(df, value_col="consumption_kwh", lead=1, key="meter_id", time_col="timestamp"):
+    """df sorted by (key, time) with only target_next added (for features that are already computed)."""
+    order, codes = sort_order(df, key, time_col)
+    out = df.iloc[order].copy()
+    pos, _, run_len = _segments(codes[order])
+    out["target_next"] = shifted(out[value_col].to_numpy(dtype="float64"), pos, run_len, -lead)
+    return out
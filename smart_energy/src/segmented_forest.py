@@ -0,0 +1,150 @@
+# smart_energy/src/segmented_forest.py
+# One IsolationForest per meter segment (meter_type, optionally split into consumption clusters)
+import os
+import sys
+import time
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import IsolationForest
+
+FEATURES = ["consumption_kwh", "voltage", "frequency_hz"]
+N_JOBS = int(os.environ.get("ANOMALY_N_JOBS", os.cpu_count() or 1))  # Segments fitted concurrently
+CLUSTERS = int(os.environ.get("ANOMALY_CLUSTERS", 1))  # Consumption clusters per meter_type (1 = type only)
+
+def _fit_segment(segment, X, contamination, random_state):
+    """Worker: fit one segment's forest."""
+    start = time.perf_counter()
+    model = IsolationForest(contamination=contamination, random_state=random_state, n_jobs=1)
+    model.fit(X)
+    return segment, model, time.perf_counter() - start
+
+class SegmentedForest:
+    """
+    IsolationForest per meter_type, so industrial loads no longer set the
+    scale for residential meters. With clusters > 1 each type is further
+    split by the meter's mean consumption into quantile bins; the bin edges
+    are kept so new rows land in the same segments at scoring time, and each
+    training meter keeps the segment it was fitted in (a spike in the batch
+    being scored must not move its meter into another segment's model).
+    Segments are fitted in parallel in a process pool of n_jobs workers.
+    """
+
+    def __init__(self, clusters=CLUSTERS, contamination=0.01, n_jobs=N_JOBS, random_state=42):
+        self.clusters = clusters
+        self.contamination = contamination
+        self.n_jobs = n_jobs
+        self.random_state = random_state
+        self.edges = {}
+        self.meter_segments = {}  # meter_id -> segment from the training data
+        self.models = {}
+        self.fit_seconds = {}
+
+    def segments(self, df):
+        """
+        Segment key per row: 'industrial', or 'industrial/2' with clusters.
+        Meters seen in fit() keep their training segment; only unseen meters
+        are binned by their mean consumption in df.
+        """
+        types = df["meter_type"].astype(str)
+        if self.clusters <= 1:
+            return types
+        meter_mean = df.groupby("meter_id", observed=True)["consumption_kwh"].transform("mean")
+        keys = types.copy()
+        for meter_type, edges in self.edges.items():
+            rows = types == meter_type
+            # Interior edges only, so meters outside the training range fall in the first/last bin
+            bins = np.searchsorted(edges[1:-1], meter_mean[rows].to_numpy(), side="right")
+            keys.loc[rows] = [f"{meter_type}/{b}" for b in bins]
+        known = df["meter_id"].astype(str).map(getattr(self, "meter_segments", {}))  # Older pickles have none
+        return known.fillna(keys)
+
+    def fit(self, df):
+        if self.clusters > 1:
+            meter_mean = df.groupby("meter_id", observed=True).agg(
+                meter_type=("meter_type", "first"), mean=("consumption_kwh", "mean"))
+            self.edges = {t: np.quantile(g["mean"], np.linspace(0, 1, self.clusters + 1))
+                          for t, g in meter_mean.groupby(meter_mean["meter_type"].astype(str))}
+            self.meter_segments = {}
+        keys = self.segments(df)
+        if self.clusters > 1:
+            first = ~df["meter_id"].duplicated().to_numpy()
+            self.meter_segments = dict(zip(df["meter_id"].astype(str).to_numpy()[first], keys.to_numpy()[first]))
+        X = df[FEATURES].fillna(0).to_numpy()
+        tasks = [(segment, X[(keys == segment).to_numpy()], self.contamination, self.random_state)
+                 for segment in sorted(keys.unique())]
+
+        start = time.perf_counter()
+        if self.n_jobs == 1 or len(tasks) == 1:
+            results = [_fit_segment(*task) for task in tasks]
+        else:
+            with ProcessPoolExecutor(max_workers=min(self.n_jobs, len(tasks))) as pool:
+                results = list(pool.map(_fit_segment, *zip(*tasks)))
+        self.wall_seconds = time.perf_counter() - start
+        self.models = {segment: model for segment, model, _ in results}
+        self.fit_seconds = {segment: seconds for segment, _, seconds in results}
+        return self
+
+    def decision_function(self, df):
+        """Per-row score (IsolationForest convention: negative = anomalous); NaN for unknown segments."""
+        keys = self.segments(df)
+        scores = pd.Series(np.nan, index=df.index)
+        X = df[FEATURES].fillna(0).to_numpy()
+        for segment in keys.unique():
+            rows = (keys == segment).to_numpy()
+            model = self.models.get(segment)
+            if model is None:
+                print(f"No model for segment {segment}; {rows.sum()} rows left unscored")
+                continue
+            scores[rows] = model.decision_function(X[rows])
+        return scores
+
+    def predict(self, df):
+        """1 for anomalies, 0 otherwise (the old anomaly_iforest column)."""
+        return (self.decision_function(df) < 0).astype(int)
+
+def segment_report(df, flags, keys, label_col="is_anomaly"):
+    """Rows, flagged share and, with ground-truth labels, false-positive rate and recall per segment."""
+    out = pd.DataFrame({"segment": keys.to_numpy(), "flag": flags.to_numpy()})
+    report = out.groupby("segment").agg(rows=("flag", "size"), flagged=("flag", "mean"))
+    if label_col in df.columns:
+        out["label"] = df[label_col].to_numpy().astype(bool)
+        negatives = out[~out["label"]].groupby("segment")["flag"]
+        positives = out[out["label"]].groupby("segment")["flag"]
+        report["fpr"] = negatives.mean()
+        report["recall"] = positives.mean()
+    return report
+
+def compare(df, clusters=CLUSTERS, n_jobs=N_JOBS):
+    """Global single forest vs segmented forests on the same data: fit wall time and per-segment quality."""
+    by_type = df["meter_type"].astype(str)
+
+    start = time.perf_counter()
+    flat = IsolationForest(contamination=0.01, random_state=42).fit(df[FEATURES].fillna(0).to_numpy())
+    flat_seconds = time.perf_counter() - start
+    flat_flags = pd.Series((flat.predict(df[FEATURES].fillna(0).to_numpy()) == -1).astype(int), index=df.index)
+
+    seg = SegmentedForest(clusters=clusters, n_jobs=n_jobs).fit(df)
+    seg_flags = seg.predict(df)
+
+    print(f"Single forest: fit {flat_seconds:.2f}s")
+    print(segment_report(df, flat_flags, by_type).round(4).to_string())
+    print(f"Segmented ({len(seg.models)} segments, n_jobs={n_jobs}): fit wall {seg.wall_seconds:.2f}s")
+    print(segment_report(df, seg_flags, by_type).round(4).to_string())
+    return flat_seconds, seg.wall_seconds
+
+if __name__ == "__main__":
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "data_pipeline"))
+    from simulate_meters import iter_meter_chunks
+
+    parser = argparse.ArgumentParser(description="Single vs per-meter-type anomaly models on labelled simulated data.")
+    parser.add_argument("--meters", type=int, default=2000)
+    parser.add_argument("--days", type=int, default=1)
+    parser.add_argument("--clusters", type=int, default=CLUSTERS)
+    parser.add_argument("--n-jobs", type=int, default=N_JOBS)
+    args = parser.parse_args()
+    chunks = iter_meter_chunks(pd.Timestamp.now().floor("D") - pd.Timedelta(days=args.days), args.meters,
+                               args.days * 288, workers=1, label_anomalies=True)
+    compare(pd.concat(chunks, ignore_index=True), args.clusters, args.n_jobs)
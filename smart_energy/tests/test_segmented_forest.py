@@ -0,0 +1,35 @@
+# smart_energy/tests/test_segmented_forest.py
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+from segmented_forest import SegmentedForest
+
+def _readings(means, n=100, seed=0):
+    rng = np.random.default_rng(seed)
+    frames = [pd.DataFrame({"meter_id": f"meter_{i:04d}", "meter_type": "residential",
+                            "consumption_kwh": mean + rng.normal(0, 0.01 * mean, n),
+                            "voltage": 230 + rng.normal(0, 2, n), "frequency_hz": 50 + rng.normal(0, 0.05, n)})
+              for i, mean in enumerate(means)]
+    return pd.concat(frames, ignore_index=True)
+
+def test_spiking_meter_keeps_its_segment():
+    train = _readings(np.linspace(0.1, 1.0, 20))
+    model = SegmentedForest(clusters=4, n_jobs=1).fit(train)
+    before = model.segments(train)
+
+    batch = train[train["meter_id"].isin(["meter_0000", "meter_0010"])].copy()
+    spike = batch.index[(batch["meter_id"] == "meter_0000").to_numpy()][:20]
+    batch.loc[spike, "consumption_kwh"] *= 50  # Lifts this meter's batch mean past the training bins
+    assert batch.groupby("meter_id")["consumption_kwh"].mean()["meter_0000"] > train["consumption_kwh"].mean()
+
+    assert (model.segments(batch) == before[batch.index]).all()
+    assert model.decision_function(batch).notna().all()
+
+def test_unseen_meter_is_binned_by_batch_mean():
+    model = SegmentedForest(clusters=4, n_jobs=1).fit(_readings(np.linspace(0.1, 1.0, 20)))
+    new = _readings([5.0]).assign(meter_id="meter_9999")
+    assert (model.segments(new) == "residential/3").all()
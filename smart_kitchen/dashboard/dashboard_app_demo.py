@@ -1,4 +1,5 @@
 import os
+import sys
 import sqlite3
 import pandas as pd
 import streamlit as st
@@ -6,12 +7,15 @@ import matplotlib.pyplot as plt
 import json
 import threading
 import time
-from datetime import datetime
+from datetime import datetime, timedelta
 import paho.mqtt.client as mqtt
 import ssl  # For IoT Core TLS
 import streamlit_authenticator as stauth  # For customer auth
 
 base_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(base_dir, '..', 'data_pipeline'))
+from retention import read_range  # Raw / 1m / 1h history
+
 ALERT_LOG = os.getenv('ALERTS_PATH', os.path.join(base_dir, "../alerts")) + "/alert_log.txt"
 DB_PATH = os.getenv('DB_PATH', '/app/kitchen.db')
 ANOMALY_PATH = os.getenv('MODELS_PATH', os.path.join(base_dir, "../models")) + "/results/anomaly_results.csv"
@@ -138,7 +142,10 @@ if 'live_sensor_data' not in st.session_state:
         cursor = conn.cursor()
         cursor.execute("PRAGMA table_info(sensor_data)")
         columns = [col[1] for col in cursor.fetchall()]
-        if 'tenant_id' in columns:
+        if 'ts' in columns:
+            # Schema v2: tenant_id is backfilled and ts is indexed
+            df = pd.read_sql("SELECT * FROM sensor_data WHERE tenant_id = ? ORDER BY ts DESC LIMIT 500", conn, params=[tenant_id])
+        elif 'tenant_id' in columns:
             df = pd.read_sql("SELECT * FROM sensor_data WHERE tenant_id = ? OR tenant_id IS NULL ORDER BY timestamp DESC LIMIT 500", conn, params=[tenant_id])
         else:
             df = pd.read_sql("SELECT * FROM sensor_data ORDER BY timestamp DESC LIMIT 500", conn)
@@ -367,9 +374,21 @@ elif section == "Live Alerts":
 
 elif section == "Historical Data":
     st.subheader(f"📊 Historical — {selected_device} (Tenant: {tenant_id})")
-    if not device_data.empty:
-        st.line_chart(device_data.set_index("timestamp")[["temperature_C", "CO_ppm", "CO2_ppm", "power_W"]])
-        st.dataframe(device_data.describe().round(2))
+    windows = {"Last 6 hours": 6, "Last 3 days": 72, "Last 30 days": 720}
+    window = st.selectbox("Window", list(windows), index=0)
+    try:
+        conn = sqlite3.connect(DB_PATH)
+        # Picks raw rows or the 1m/1h rollups so long windows stay a few thousand points
+        hist = read_range(conn, tenant_id, selected_device, datetime.now() - timedelta(hours=windows[window]))
+        conn.close()
+    except Exception as e:
+        st.error(f"History load error: {e}")
+        hist = pd.DataFrame()
+    if not hist.empty:
+        metric_cols = ["temperature_C", "CO_ppm", "CO2_ppm", "power_W"]
+        st.caption(f"Resolution: {hist.attrs['resolution']} ({len(hist)} points)")
+        st.line_chart(hist.set_index("timestamp")[metric_cols])
+        st.dataframe(hist[metric_cols].describe().round(2))
     else:
         st.info("No historical data.")
 
@@ -311,7 +311,7 @@ st.markdown("Real-time IoT sensor streaming, anomalies, and instant alerts via M
 if 'live_sensor_data' not in st.session_state:
     # Initialize with historical DB data
     conn = sqlite3.connect(DB_PATH)
-    df = pd.read_sql("SELECT * FROM sensor_data ORDER BY timestamp DESC LIMIT 500", conn)  # Last 500 for perf
+    df = pd.read_sql("SELECT * FROM sensor_data ORDER BY ts DESC LIMIT 500", conn)  # Last 500 for perf (indexed)
     conn.close()
     df["timestamp"] = pd.to_datetime(df["timestamp"])
     st.session_state.live_sensor_data = df.sort_values('timestamp')
@@ -0,0 +1,164 @@
+import io
+import os
+import time
+import sqlite3
+import argparse
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+from schema import INDEXES, init_db
+from retention import Retention
+
+# Bulk import tuning (backfilling archives of device CSVs)
+CHUNK_BYTES = int(os.getenv('IMPORT_CHUNK_MB', 16)) * 1024 * 1024   # CSV bytes parsed per task
+WORKERS = int(os.getenv('IMPORT_WORKERS', os.cpu_count() or 1))      # Parser processes
+CACHE_KB = int(os.getenv('IMPORT_CACHE_KB', 256 * 1024))             # SQLite page cache during the import
+
+COLUMNS = ['timestamp', 'device', 'temperature_C', 'CO_ppm', 'CO2_ppm', 'power_W', 'ts']
+INSERT_SQL = f"INSERT INTO sensor_data ({', '.join(COLUMNS)}) VALUES ({', '.join('?' * len(COLUMNS))})"
+
+
+def _progress_key(path):
+    """pipeline_state key for one file; changes if the file is replaced, so a new file is imported afresh."""
+    st = os.stat(path)
+    return f"bulk_import:{os.path.abspath(path)}:{st.st_size}:{st.st_mtime_ns}"
+
+
+def _chunks(path, start, chunk_bytes):
+    """(start, end) byte ranges from start to EOF, each ending on a line boundary."""
+    size = os.path.getsize(path)
+    with open(path, 'rb') as f:
+        while start < size:
+            f.seek(min(start + chunk_bytes, size))
+            f.readline()
+            end = min(f.tell(), size)
+            yield start, end
+            start = end
+
+
+def _parse_chunk(path, header, start, end, device):
+    """Worker: parse one byte range of a CSV into INSERT-ready columns."""
+    with open(path, 'rb') as f:
+        f.seek(start)
+        data = f.read(end - start)
+    df = pd.read_csv(io.BytesIO(header + data))
+    df['device'] = device
+    # Naive timestamps are UTC epoch ms, same as schema.to_epoch_ms
+    df['ts'] = (pd.to_datetime(df['timestamp']) - pd.Timestamp(0)) // pd.Timedelta(milliseconds=1)
+    return df[COLUMNS]
+
+
+def _set_import_pragmas(conn):
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=OFF")         # Progress commits with the rows, so a crash just resumes
+    conn.execute(f"PRAGMA cache_size=-{CACHE_KB}")
+    conn.execute("PRAGMA temp_store=MEMORY")
+
+
+def import_files(files, db_path="smart_kitchen.db", chunk_bytes=CHUNK_BYTES, workers=WORKERS, defer_indexes=True):
+    """
+    Bulk-load device CSVs (device name = file name) into sensor_data.
+    Files are split into line-aligned byte ranges parsed in a process pool;
+    this process is the single writer and commits the chunks of each file in
+    order, one transaction per chunk together with the file's committed byte
+    offset in pipeline_state. Re-running after an interruption continues
+    where the last commit stopped; finished files are skipped.
+    With defer_indexes the sensor_data indexes are dropped for the load and
+    rebuilt once at the end.
+    """
+    init_db(db_path)
+    conn = sqlite3.connect(db_path)
+    _set_import_pragmas(conn)
+
+    if defer_indexes:
+        for ddl in INDEXES:
+            name = ddl.split(' ON ')[0].split()[-1]  # "CREATE INDEX IF NOT EXISTS <name> ON ..."
+            conn.execute(f"DROP INDEX IF EXISTS {name}")
+        conn.commit()
+
+    total_rows, started, last_report = 0, time.time(), time.time()
+    try:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            for path in files:
+                key = _progress_key(path)
+                row = conn.execute("SELECT value FROM pipeline_state WHERE name = ?", (key,)).fetchone()
+                with open(path, 'rb') as f:
+                    header = f.readline()
+                    data_start = f.tell()
+                offset = max(row[0] if row else 0, data_start)
+                if offset >= os.path.getsize(path):
+                    print(f"⏭️ {os.path.basename(path)} already imported.")
+                    continue
+                if row:
+                    print(f"🔁 Resuming {os.path.basename(path)} at byte {offset}.")
+
+                device = os.path.basename(path).split(".")[0]
+                pending = deque()
+                ranges = _chunks(path, offset, chunk_bytes)
+                while True:
+                    # Keep a bounded number of chunks in flight so memory stays flat
+                    while len(pending) < workers * 2:
+                        try:
+                            start, end = next(ranges)
+                        except StopIteration:
+                            break
+                        pending.append((end, pool.submit(_parse_chunk, path, header, start, end, device)))
+                    if not pending:
+                        break
+                    end, future = pending.popleft()
+                    df = future.result()
+                    with conn:  # Rows and progress commit together
+                        conn.executemany(INSERT_SQL, df.itertuples(index=False, name=None))
+                        conn.execute("""
+                            INSERT INTO pipeline_state (name, value) VALUES (?, ?)
+                            ON CONFLICT (name) DO UPDATE SET value = excluded.value
+                        """, (key, end))
+                    total_rows += len(df)
+                    if time.time() - last_report >= 5:
+                        elapsed = time.time() - started
+                        print(f"📥 {total_rows} rows ({total_rows / elapsed:.0f} rows/s), "
+                              f"{os.path.basename(path)} at {100 * end / os.path.getsize(path):.0f}%")
+                        last_report = time.time()
+                print(f"✅ Imported {os.path.basename(path)}.")
+    finally:
+        if defer_indexes:
+            index_start = time.time()
+            for ddl in INDEXES:
+                conn.execute(ddl)
+            conn.commit()
+            print(f"🗂️ Rebuilt indexes in {time.time() - index_start:.1f}s.")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.close()
+
+    elapsed = time.time() - started
+    print(f"📊 Imported {total_rows} rows in {elapsed:.1f}s ({total_rows / max(elapsed, 1e-9):.0f} rows/s).")
+    return total_rows
+
+
+def import_paths(paths, db_path="smart_kitchen.db", **kwargs):
+    """import_files over CSV files and/or directories of CSVs, then fold the new rows into the rollups."""
+    files = []
+    for p in paths:
+        if os.path.isdir(p):
+            files += sorted(os.path.join(p, f) for f in os.listdir(p) if f.endswith(".csv"))
+        else:
+            files.append(p)
+    rows = import_files(files, db_path, **kwargs)
+    conn = sqlite3.connect(db_path)
+    print(f"Rolled up {Retention().update_rollups(conn)} rows.")
+    conn.close()
+    return rows
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Bulk-import device CSVs into sensor_data (resumable).")
+    parser.add_argument("paths", nargs="*", default=["simulated_data"], help="CSV files or directories")
+    parser.add_argument("--db", default="smart_kitchen.db")
+    parser.add_argument("--workers", type=int, default=WORKERS)
+    parser.add_argument("--chunk-mb", type=int, default=CHUNK_BYTES // (1024 * 1024))
+    parser.add_argument("--keep-indexes", action="store_true", help="Maintain indexes during the load instead of rebuilding")
+    args = parser.parse_args()
+    import_paths(args.paths, args.db, chunk_bytes=args.chunk_mb * 1024 * 1024, workers=args.workers,
+                 defer_indexes=not args.keep_indexes)
@@ -1,27 +1,12 @@
 import os
 import sqlite3
 import pandas as pd
+from schema import init_db
+from retention import Retention
 
 def create_database(db_path="smart_kitchen.db"):
-    """Create an SQLite database if it doesn’t exist."""
-    conn = sqlite3.connect(db_path)
-    cursor = conn.cursor()
-
-    # Create table
-    cursor.execute("""
-    CREATE TABLE IF NOT EXISTS sensor_data (
-        device TEXT,
-        timestamp TEXT,
-        temperature_C REAL,
-        CO_ppm REAL,
-        CO2_ppm REAL,
-        power_W REAL
-    )
-    """)
-    conn.commit()
-    conn.close()
-    # print(f"✅ Database created or verified at {db_path}")
-    print(f"Database created or verified at {db_path}")
+    """Create (or upgrade) the SQLite database; see schema.py for the sensor_data layout."""
+    init_db(db_path)
 
 
 def upload_csv_to_db(csv_path, db_path="smart_kitchen.db"):
@@ -36,13 +21,21 @@ def upload_csv_to_db(csv_path, db_path="smart_kitchen.db"):
     print(f"Uploaded {device} data to database.")
 
 
-def upload_all_data(data_dir="simulated_data"):
-    """Upload all .csv files in the simulated data directory."""
+def upload_all_data(data_dir="simulated_data", bulk=False):
+    """Upload all .csv files in the simulated data directory (bulk=True: parallel, resumable bulk_import)."""
+    if bulk:
+        from bulk_import import import_paths
+        import_paths([data_dir], "smart_kitchen.db")
+        return
     create_database()
     for file in os.listdir(data_dir):
         if file.endswith(".csv"):
             upload_csv_to_db(os.path.join(data_dir, file))
+    conn = sqlite3.connect("smart_kitchen.db")
+    print(f"Rolled up {Retention().update_rollups(conn)} rows.")
+    conn.close()
 
 
 if __name__ == "__main__":
-    upload_all_data()
+    import sys
+    upload_all_data(bulk="--bulk" in sys.argv)
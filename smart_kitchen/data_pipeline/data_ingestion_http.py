@@ -0,0 +1,35 @@
+import os
+from ingestion_engine import IngestionEngine, HttpSource
+from schema import init_db, to_epoch_ms
+from retention import Retention
+
+# Gateways that cannot speak MQTT/Kafka POST readings here instead
+DB_PATH = os.getenv('DB_PATH', '/app/kitchen.db')
+HTTP_HOST = os.getenv('INGEST_HTTP_HOST', '0.0.0.0')
+HTTP_PORT = int(os.getenv('INGEST_HTTP_PORT', 8081))
+TENANT_ID = os.getenv('TENANT_ID', 'demo')
+INSERT_SQL = """
+    INSERT INTO sensor_data (timestamp, device, temperature_C, CO_ppm, CO2_ppm, power_W, tenant_id, ts)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+def to_row(data):
+    """Decoded reading -> INSERT parameter tuple."""
+    return (
+        data['timestamp'],
+        data['device'],
+        data['temperature_C'],
+        data['CO_ppm'],
+        data['CO2_ppm'],
+        data['power_W'],
+        data.get('tenant_id', TENANT_ID),
+        to_epoch_ms(data['timestamp'])
+    )
+
+def consume_and_ingest():
+    init_db(DB_PATH)
+    engine = IngestionEngine(DB_PATH, INSERT_SQL, to_row, name='http-ingestion', after_flush=Retention().after_flush)
+    engine.run(HttpSource(HTTP_HOST, HTTP_PORT))
+
+if __name__ == "__main__":
+    consume_and_ingest()
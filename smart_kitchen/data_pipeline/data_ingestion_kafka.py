@@ -1,69 +1,106 @@
+import os
 import json
+import time
 import sqlite3
-from kafka import KafkaConsumer
+import argparse
+import tempfile
 from datetime import datetime
-import pandas as pd  # For any batch inserts if needed
+from ingestion_engine import IngestionEngine, KafkaSource
+from schema import init_db, to_epoch_ms
+from retention import Retention
 
 KAFKA_BOOTSTRAP_SERVERS = ['localhost:9092']
 TOPIC_PREFIX = 'smart_kitchen_'
 DB_PATH = 'smart_kitchen_kafka.db'  # Adjust to your DB path
+DEVICES = ["refrigerator", "oven", "microwave"]
 
-def init_db():
-    """Create table if not exists."""
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS sensor_data (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            timestamp TEXT,
-            device TEXT,
-            temperature_C REAL,
-            CO_ppm REAL,
-            CO2_ppm REAL,
-            power_W REAL
-        )
-    """)
-    conn.commit()
-    conn.close()
+# Batch tuning
+BATCH_SIZE = int(os.getenv('KAFKA_BATCH_SIZE', 500))            # max_records per poll()
+POLL_TIMEOUT_MS = int(os.getenv('KAFKA_POLL_TIMEOUT_MS', 1000))  # How long poll() waits for a batch
+
+INSERT_SQL = """
+    INSERT INTO sensor_data (timestamp, device, temperature_C, CO_ppm, CO2_ppm, power_W, ts)
+    VALUES (?, ?, ?, ?, ?, ?, ?)
+"""
 
-def consume_and_ingest():
-    """Consume from Kafka and insert to SQLite."""
-    init_db()
-    devices = ["refrigerator", "oven", "microwave"]
-    consumer = KafkaConsumer(
-        *[TOPIC_PREFIX + device for device in devices],
-        bootstrap_servers=KAFKA_BOOTSTRAP_SERVERS,
-        value_deserializer=lambda m: json.loads(m.decode('utf-8')),
-        auto_offset_reset='latest',  # Start from new messages
-        enable_auto_commit=True,
-        group_id='kitchen-ingestion-group'
+def to_row(data):
+    """Decoded message -> INSERT parameter tuple."""
+    return (
+        data['timestamp'],
+        data['device'],
+        data['temperature_C'],
+        data['CO_ppm'],
+        data['CO2_ppm'],
+        data['power_W'],
+        to_epoch_ms(data['timestamp'])
     )
-    
-    print("📥 Starting ingestion from Kafka to SQLite...")
-    conn = sqlite3.connect(DB_PATH)
-    
-    try:
-        for message in consumer:
-            data = message.value
-            cursor = conn.cursor()
-            cursor.execute("""
-                INSERT INTO sensor_data (timestamp, device, temperature_C, CO_ppm, CO2_ppm, power_W)
-                VALUES (?, ?, ?, ?, ?, ?)
-            """, (
-                data['timestamp'],
-                data['device'],
-                data['temperature_C'],
-                data['CO_ppm'],
-                data['CO2_ppm'],
-                data['power_W']
-            ))
-            conn.commit()
-            print(f"💾 Ingested: {data['device']} at {data['timestamp'][:19]}")
-    except KeyboardInterrupt:
-        print("🛑 Ingestion stopped.")
-    finally:
-        conn.close()
-        consumer.close()
+
+def decode_row(raw):
+    """Kafka message value (bytes) -> INSERT parameter tuple."""
+    return to_row(json.loads(raw.decode('utf-8')))
+
+def write_message(conn, row):
+    """Per-message path: one INSERT, one commit."""
+    conn.execute(INSERT_SQL, row)
+    conn.commit()
+
+def write_batch(conn, rows):
+    """Batch path: one executemany inside a single transaction."""
+    with conn:
+        conn.executemany(INSERT_SQL, rows)
+
+def consume_and_ingest(batch_size=BATCH_SIZE, poll_timeout_ms=POLL_TIMEOUT_MS):
+    """
+    Consume from Kafka in polled batches through the ingestion engine.
+    Offsets are committed only after the rows are committed to SQLite, so a
+    crash can re-deliver rows but never lose them.
+    """
+    init_db(DB_PATH)
+    engine = IngestionEngine(DB_PATH, INSERT_SQL, to_row, name='kafka-ingestion', after_flush=Retention().after_flush)
+    engine.run(KafkaSource(KAFKA_BOOTSTRAP_SERVERS, [TOPIC_PREFIX + device for device in DEVICES],
+                           group_id='kitchen-ingestion-group', batch_size=batch_size, poll_timeout_ms=poll_timeout_ms))
+
+def benchmark(n_messages=20000, batch_size=BATCH_SIZE):
+    """
+    Compare the per-message and batch write paths on synthetic messages.
+    Kafka itself is left out so the numbers isolate the decode + SQLite cost.
+    """
+    messages = [json.dumps({
+        "timestamp": datetime.now().isoformat(),
+        "device": DEVICES[i % len(DEVICES)],
+        "temperature_C": 4.0 + (i % 10) * 0.1,
+        "CO_ppm": 2.0,
+        "CO2_ppm": 400.0,
+        "power_W": 120.0
+    }).encode('utf-8') for i in range(n_messages)]
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for mode in ("per-message", "batch"):
+            db_path = os.path.join(tmp, f"bench_{mode}.db")
+            init_db(db_path)
+            conn = sqlite3.connect(db_path)
+            start = time.perf_counter()
+            if mode == "per-message":
+                for raw in messages:
+                    write_message(conn, decode_row(raw))
+            else:
+                for i in range(0, n_messages, batch_size):
+                    write_batch(conn, [decode_row(raw) for raw in messages[i:i + batch_size]])
+            elapsed = time.perf_counter() - start
+            conn.close()
+            results[mode] = n_messages / elapsed
+            print(f"⏱️ {mode:>11}: {elapsed:.2f}s ({results[mode]:.0f} msgs/s)")
+    print(f"🚀 Batch speedup: {results['batch'] / results['per-message']:.1f}x (batch size {batch_size})")
+    return results
 
 if __name__ == "__main__":
-    consume_and_ingest()
\ No newline at end of file
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--benchmark", type=int, metavar="N", help="Benchmark both write paths with N synthetic messages")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    parser.add_argument("--poll-timeout-ms", type=int, default=POLL_TIMEOUT_MS)
+    args = parser.parse_args()
+    if args.benchmark:
+        benchmark(args.benchmark, args.batch_size)
+    else:
+        consume_and_ingest(args.batch_size, args.poll_timeout_ms)
@@ -69,7 +69,7 @@
 #         print(f"❌ Ingestion error: {e}")
 
 # def consume_and_ingest():
-#     init_db()
+#     init_db(DB_PATH)
 #     client = mqtt.Client()
 #     client.on_connect = on_connect
 #     client.on_message = on_message
@@ -81,10 +81,10 @@
 
 
 import os
-import json
-import sqlite3
-import paho.mqtt.client as mqtt
 from pathlib import Path
+from ingestion_engine import IngestionEngine, MqttSource
+from schema import init_db, to_epoch_ms
+from retention import Retention
 
 # Compute project root: Up one level from script dir
 project_root = Path(__file__).parent.parent.absolute()
@@ -92,67 +92,28 @@ DB_PATH = os.getenv('DB_PATH', '/app/kitchen.db')  # Env var with fallback
 MQTT_BROKER = os.getenv('MQTT_BROKER', 'localhost')
 MQTT_PORT = int(os.getenv('MQTT_PORT', 1883))
 MQTT_PREFIX = 'smart_kitchen/'
+DEVICES = ["refrigerator", "oven", "microwave"]
+INSERT_SQL = """
+    INSERT INTO sensor_data (timestamp, device, temperature_C, CO_ppm, CO2_ppm, power_W, ts)
+    VALUES (?, ?, ?, ?, ?, ?, ?)
+"""
 
-def init_db():
-    """Create table if not exists."""
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS sensor_data (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            timestamp TEXT,
-            device TEXT,
-            temperature_C REAL,
-            CO_ppm REAL,
-            CO2_ppm REAL,
-            power_W REAL
-        )
-    """)
-    conn.commit()
-    conn.close()
-
-def on_connect(client, userdata, flags, rc):
-    """Subscribe on connect."""
-    if rc == 0:
-        print("✅ Connected to MQTT for ingestion.")
-        devices = ["refrigerator", "oven", "microwave"]
-        for device in devices:
-            topic = MQTT_PREFIX + device
-            client.subscribe(topic)
-            print(f"📥 Subscribed to {topic}")
-    else:
-        print(f"❌ MQTT connect failed: {rc}")
-
-def on_message(client, userdata, msg):
-    """Handle incoming message: Parse JSON, insert to DB."""
-    try:
-        data = json.loads(msg.payload.decode())
-        conn = sqlite3.connect(DB_PATH)
-        cursor = conn.cursor()
-        cursor.execute("""
-            INSERT INTO sensor_data (timestamp, device, temperature_C, CO_ppm, CO2_ppm, power_W)
-            VALUES (?, ?, ?, ?, ?, ?)
-        """, (
-            data['timestamp'],
-            data['device'],
-            data['temperature_C'],
-            data['CO_ppm'],
-            data['CO2_ppm'],
-            data['power_W']
-        ))
-        conn.commit()
-        conn.close()
-        print(f"💾 Ingested: {data['device']} at {data['timestamp'][:19]} ({data['temperature_C']}°C)")
-    except Exception as e:
-        print(f"❌ Ingestion error: {e}")
+def to_row(data):
+    """Decoded message -> INSERT parameter tuple."""
+    return (
+        data['timestamp'],
+        data['device'],
+        data['temperature_C'],
+        data['CO_ppm'],
+        data['CO2_ppm'],
+        data['power_W'],
+        to_epoch_ms(data['timestamp'])
+    )
 
 def consume_and_ingest():
-    init_db()
-    client = mqtt.Client()
-    client.on_connect = on_connect
-    client.on_message = on_message
-    client.connect(MQTT_BROKER, MQTT_PORT, 60)
-    client.loop_forever()  # Blocks indefinitely
+    init_db(DB_PATH)
+    engine = IngestionEngine(DB_PATH, INSERT_SQL, to_row, name='mqtt-ingestion', after_flush=Retention().after_flush)
+    engine.run(MqttSource(MQTT_BROKER, MQTT_PORT, [MQTT_PREFIX + device for device in DEVICES]))
 
 if __name__ == "__main__":
-    consume_and_ingest()
\ No newline at end of file
+    consume_and_ingest()
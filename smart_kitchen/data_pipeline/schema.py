@@ -0,0 +1,142 @@
+import sqlite3
+from datetime import datetime, timezone
+
+# Bump when sensor_data changes; stored in PRAGMA user_version
+SCHEMA_VERSION = 3
+DEFAULT_TENANT = 'demo'
+BACKFILL_BATCH = 50000  # Rows per UPDATE while backfilling, keeps write locks short
+
+# ISO TEXT -> epoch milliseconds (naive timestamps are treated as UTC, same as to_epoch_ms)
+TS_FROM_TEXT_SQL = "CAST(ROUND((julianday({col}) - 2440587.5) * 86400000) AS INTEGER)"
+
+SENSOR_DATA_DDL = f"""
+    CREATE TABLE IF NOT EXISTS sensor_data (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        timestamp TEXT,
+        device TEXT,
+        temperature_C REAL,
+        CO_ppm REAL,
+        CO2_ppm REAL,
+        power_W REAL,
+        tenant_id TEXT DEFAULT '{DEFAULT_TENANT}',
+        ts INTEGER  -- epoch ms, indexed; readers order/filter on this instead of timestamp
+    )
+"""
+
+INDEXES = [
+    # Latest-N per device: WHERE tenant_id=? AND device=? ORDER BY ts DESC LIMIT N
+    "CREATE INDEX IF NOT EXISTS idx_sensor_data_tenant_device_ts ON sensor_data (tenant_id, device, ts)",
+    # Latest-N / time ranges across devices
+    "CREATE INDEX IF NOT EXISTS idx_sensor_data_ts ON sensor_data (ts)",
+]
+
+# Downsampled tiers maintained by retention.py (v3). One row per series per bucket.
+ROLLUP_TABLES = {'1m': ('sensor_rollup_1m', 60 * 1000), '1h': ('sensor_rollup_1h', 60 * 60 * 1000)}
+ROLLUP_DDL = """
+    CREATE TABLE IF NOT EXISTS {table} (
+        tenant_id TEXT NOT NULL,
+        device TEXT NOT NULL,
+        metric TEXT NOT NULL,
+        bucket_ts INTEGER NOT NULL,  -- epoch ms of the bucket start
+        min_val REAL,
+        max_val REAL,
+        sum_val REAL,
+        count INTEGER,
+        PRIMARY KEY (tenant_id, device, metric, bucket_ts)
+    ) WITHOUT ROWID
+"""
+
+# Small key/value table for watermarks (e.g. last sensor_data rowid rolled up)
+PIPELINE_STATE_DDL = """
+    CREATE TABLE IF NOT EXISTS pipeline_state (
+        name TEXT PRIMARY KEY,
+        value INTEGER
+    )
+"""
+
+# Safety net for writers that only send the ISO timestamp (pandas to_sql, older scripts)
+TS_TRIGGER = f"""
+    CREATE TRIGGER IF NOT EXISTS sensor_data_fill_ts AFTER INSERT ON sensor_data
+    WHEN NEW.ts IS NULL AND NEW.timestamp IS NOT NULL
+    BEGIN
+        UPDATE sensor_data SET ts = {TS_FROM_TEXT_SQL.format(col='NEW.timestamp')} WHERE rowid = NEW.rowid;
+    END
+"""
+
+
+def to_epoch_ms(timestamp):
+    """ISO-8601 string (or datetime) -> epoch milliseconds."""
+    dt = datetime.fromisoformat(timestamp) if isinstance(timestamp, str) else timestamp
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return int(round(dt.timestamp() * 1000))
+
+
+def _columns(conn, table):
+    return {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}
+
+
+def migrate(conn, batch_size=BACKFILL_BATCH):
+    """
+    Bring sensor_data up to SCHEMA_VERSION in place: add tenant_id/ts,
+    backfill ts from the ISO timestamp in batches, build the indexes and
+    the rollup tables (filled incrementally by retention.py).
+    Safe to run repeatedly.
+    """
+    version = conn.execute("PRAGMA user_version").fetchone()[0]
+    conn.execute(SENSOR_DATA_DDL)
+    columns = _columns(conn, 'sensor_data')
+    if 'tenant_id' not in columns:
+        conn.execute(f"ALTER TABLE sensor_data ADD COLUMN tenant_id TEXT DEFAULT '{DEFAULT_TENANT}'")
+    if 'ts' not in columns:
+        conn.execute("ALTER TABLE sensor_data ADD COLUMN ts INTEGER")
+    conn.commit()
+
+    if version < SCHEMA_VERSION:
+        conn.execute(f"UPDATE sensor_data SET tenant_id = '{DEFAULT_TENANT}' WHERE tenant_id IS NULL")
+        conn.commit()
+        # Walk rowid ranges: each pass touches new rows, so unparseable timestamps (ts stays NULL) can't stall it
+        last, top = conn.execute("SELECT COALESCE(MIN(rowid) - 1, 0), COALESCE(MAX(rowid), 0) FROM sensor_data").fetchone()
+        backfilled = 0
+        while last < top:
+            upper = min(top, last + batch_size)
+            cur = conn.execute(f"""
+                UPDATE sensor_data SET ts = {TS_FROM_TEXT_SQL.format(col='timestamp')}
+                WHERE rowid > ? AND rowid <= ? AND ts IS NULL AND timestamp IS NOT NULL
+            """, (last, upper))
+            conn.commit()
+            backfilled += cur.rowcount
+            last = upper
+        unparsed = conn.execute("SELECT COUNT(*) FROM sensor_data WHERE ts IS NULL AND timestamp IS NOT NULL").fetchone()[0]
+        if backfilled:
+            print(f"🔁 Backfilled ts for {backfilled} sensor_data rows.")
+        if unparsed:
+            print(f"⚠️ {unparsed} sensor_data rows have an unparseable timestamp; their ts stays NULL.")
+
+    for ddl in INDEXES:
+        conn.execute(ddl)
+    for table, _ in ROLLUP_TABLES.values():
+        conn.execute(ROLLUP_DDL.format(table=table))
+        conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{table}_bucket ON {table} (bucket_ts)")
+    conn.execute(PIPELINE_STATE_DDL)
+    conn.execute(TS_TRIGGER)
+    conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+    conn.commit()
+
+
+def init_db(db_path):
+    """Create or upgrade sensor_data at db_path."""
+    conn = sqlite3.connect(db_path)
+    try:
+        migrate(conn)
+    finally:
+        conn.close()
+    print(f"✅ DB initialized (schema v{SCHEMA_VERSION}) at {db_path}")
+
+
+if __name__ == "__main__":
+    import os
+    import argparse
+    parser = argparse.ArgumentParser(description="Migrate a kitchen DB to the current sensor_data schema.")
+    parser.add_argument("db_path", nargs="?", default=os.getenv('DB_PATH', '/app/kitchen.db'))
+    init_db(parser.parse_args().db_path)
@@ -13,6 +13,9 @@ from dotenv import load_dotenv
 
 load_dotenv()  # Load .env variables
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "data_pipeline"))
+from schema import init_db  # sensor_data schema + migrations
+
 import jwt
 import datetime
 
@@ -104,8 +107,8 @@ def api_live_data(device):
         SELECT timestamp, temperature, humidity, vibration, pressure, power_usage
         FROM sensor_data 
         WHERE tenant_id = ? AND device = ? 
-        ORDER BY timestamp DESC LIMIT 100
-    """
+        ORDER BY ts DESC LIMIT 100
+    """  # Served by idx_sensor_data_tenant_device_ts
     df = pd.read_sql(query, conn, params=(tenant_id, device))
     conn.close()
     # Return oldest first for charts
@@ -170,6 +173,9 @@ def main():
 
     base_dir = os.path.dirname(os.path.abspath(__file__))
 
+    # Upgrade existing DBs (ts column + indexes) before the API reads them
+    init_db(DB_PATH)
+
     # Paths
     simulate_path = os.path.join(base_dir, "data_pipeline", "data_demo.py")
     ingestion_path = os.path.join(base_dir, "data_pipeline", "data_ingestion_demo.py")
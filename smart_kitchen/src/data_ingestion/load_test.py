@@ -0,0 +1,88 @@
+import time
+import argparse
+import statistics
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+import requests
+
+
+# ======================================================
+# Load test for /upload_data
+#
+# Compare the old and new storage paths:
+#   INGEST_SINK=legacy  uvicorn server:app --port 8000    # synchronous CSV append
+#   INGEST_SINK=parquet uvicorn server:app --port 8000    # buffered columnar sink
+#   INGEST_SINK=parquet INGEST_ACK=flush uvicorn server:app --port 8000
+# then run: python load_test.py --requests 5000 --concurrency 32
+# ======================================================
+
+DEVICES = ["refrigerator", "oven", "microwave"]
+
+
+def make_payload(device_id, n_readings):
+    start = datetime.now()
+    return {
+        "device_id": device_id,
+        "readings": [{
+            "timestamp": (start + timedelta(seconds=i)).isoformat(),
+            "temperature": 4.0,
+            "co": 2.0,
+            "co2": 400.0,
+            "power": 120.0,
+            "device": device_id
+        } for i in range(n_readings)]
+    }
+
+
+def percentile(sorted_values, p):
+    if not sorted_values:
+        return 0.0
+    k = min(len(sorted_values) - 1, int(round(p / 100 * (len(sorted_values) - 1))))
+    return sorted_values[k]
+
+
+def run(url, n_requests, concurrency, readings_per_request):
+    payloads = [make_payload(d, readings_per_request) for d in DEVICES]
+    session = requests.Session()
+    session.mount("http://", requests.adapters.HTTPAdapter(pool_maxsize=concurrency))
+
+    def one(i):
+        start = time.perf_counter()
+        try:
+            ok = session.post(url, json=payloads[i % len(payloads)], timeout=30).status_code == 200
+        except requests.exceptions.RequestException:
+            ok = False
+        return time.perf_counter() - start, ok
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(one, range(n_requests)))
+    elapsed = time.perf_counter() - started
+
+    latencies = sorted(lat * 1000 for lat, _ in results)
+    failed = sum(1 for _, ok in results if not ok)
+    summary = {
+        "requests": n_requests,
+        "failed": failed,
+        "req_per_s": n_requests / elapsed,
+        "readings_per_s": (n_requests - failed) * readings_per_request / elapsed,
+        "p50_ms": statistics.median(latencies),
+        "p99_ms": percentile(latencies, 99),
+        "max_ms": latencies[-1],
+    }
+    print(f"[✓] {n_requests} requests ({failed} failed) in {elapsed:.2f}s, concurrency {concurrency}, "
+          f"{readings_per_request} readings/request")
+    print(f"    {summary['req_per_s']:.1f} req/s, {summary['readings_per_s']:.0f} readings/s, "
+          f"p50 {summary['p50_ms']:.1f} ms, p99 {summary['p99_ms']:.1f} ms, max {summary['max_ms']:.1f} ms")
+    return summary
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load test the ingestion server's /upload_data endpoint.")
+    parser.add_argument("--url", default="http://127.0.0.1:8000/upload_data")
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--readings", type=int, default=60, help="Readings per request")
+    args = parser.parse_args()
+    run(args.url, args.requests, args.concurrency, args.readings)
@@ -1,10 +1,13 @@
 from fastapi import FastAPI, Request
 from fastapi.responses import JSONResponse
-from pydantic import BaseModel
+from pydantic import BaseModel, ValidationError
+from contextlib import asynccontextmanager
 from typing import List, Dict, Any
 import pandas as pd
 import os
-from datetime import datetime
+
+from sinks import BufferedSink, create_sink
+from stream_decoder import DecodeError, body_format, iter_records
 
 
 # ======================================================
@@ -14,9 +17,37 @@ from datetime import datetime
 DATA_DIR = "../../data/raw"
 os.makedirs(DATA_DIR, exist_ok=True)
 
+# Storage: "parquet" / "arrow" (rolling columnar files), "csv" (same files as before, buffered)
+# or "legacy" (write the CSV inside the request, the old behaviour; kept for load-test comparisons)
+INGEST_SINK = os.getenv("INGEST_SINK", "parquet")
+# Durability: "enqueue" acks once the readings are queued, "flush" acks once they are on disk
+INGEST_ACK = os.getenv("INGEST_ACK", "enqueue")
+SINK_FLUSH_ROWS = int(os.getenv("SINK_FLUSH_ROWS", 5000))
+SINK_FLUSH_S = float(os.getenv("SINK_FLUSH_S", 1.0))
+SINK_QUEUE_SIZE = int(os.getenv("SINK_QUEUE_SIZE", 1000))  # Requests buffered before uploads start waiting
+STREAM_CHUNK_ROWS = int(os.getenv("STREAM_CHUNK_ROWS", 2000))  # Readings validated and stored per step of a streamed upload
+
+sink = None
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    global sink
+    if INGEST_SINK != "legacy":
+        sink = BufferedSink(create_sink(INGEST_SINK, DATA_DIR), flush_rows=SINK_FLUSH_ROWS,
+                            flush_interval_s=SINK_FLUSH_S, queue_size=SINK_QUEUE_SIZE, ack=INGEST_ACK)
+        await sink.start()
+        print(f"[✓] Buffered {INGEST_SINK} sink started (ack on {INGEST_ACK}) → {DATA_DIR}")
+    yield
+    if sink is not None:
+        await sink.close()  # Drains the queue and closes open files
+        print(f"[✓] Sink closed after {sink.rows_written} rows")
+
+
 app = FastAPI(title="Smart Kitchen IoT Data Ingestion API",
               description="Receives IoT sensor data from kitchen devices.",
-              version="1.0")
+              version="1.0",
+              lifespan=lifespan)
 
 
 # ======================================================
@@ -42,7 +73,7 @@ class DeviceData(BaseModel):
 # ======================================================
 
 def save_to_csv(device_name: str, readings: List[Dict[str, Any]]):
-    """Append received data to a CSV file."""
+    """Append received data to a CSV file (legacy synchronous path)."""
     df = pd.DataFrame(readings)
     filename = os.path.join(DATA_DIR, f"{device_name}_data_received.csv")
     file_exists = os.path.isfile(filename)
@@ -50,6 +81,13 @@ def save_to_csv(device_name: str, readings: List[Dict[str, Any]]):
     print(f"[✓] Saved {len(df)} new rows to {filename}")
 
 
+async def store(device_name: str, readings: List[Dict[str, Any]]):
+    if sink is None:
+        save_to_csv(device_name, readings)
+    else:
+        await sink.submit(device_name, readings)
+
+
 # ======================================================
 # API Endpoints
 # ======================================================
@@ -63,12 +101,52 @@ def root():
 async def upload_data(payload: DeviceData):
     try:
         readings = [reading.dict() for reading in payload.readings]
-        save_to_csv(payload.device_id, readings)
+        await store(payload.device_id, readings)
         return JSONResponse(content={"status": "success", "rows_received": len(readings)})
     except Exception as e:
         return JSONResponse(status_code=500, content={"status": "error", "message": str(e)})
 
 
+@app.post("/upload_stream/{device_id}")
+async def upload_stream(device_id: str, request: Request):
+    """
+    Streamed bulk upload: one reading per NDJSON line (Content-Type: application/x-ndjson)
+    or a sequence of msgpack maps (application/msgpack), optionally with
+    Content-Encoding: gzip. The body is decoded and validated as it arrives and
+    stored every STREAM_CHUNK_ROWS readings, so server memory stays flat however
+    large the upload is. Invalid readings are skipped and counted.
+    """
+    try:
+        fmt = body_format(request.headers.get("content-type", ""))
+    except DecodeError as e:
+        return JSONResponse(status_code=415, content={"status": "error", "message": str(e)})
+
+    received, rejected = 0, 0
+    chunk = []
+    try:
+        records = iter_records(request.stream(), fmt, request.headers.get("content-encoding", ""))
+        async for record in records:
+            try:
+                if isinstance(record, DecodeError):
+                    raise record
+                chunk.append(SensorReading(**record).dict())
+            except (DecodeError, ValidationError, TypeError):
+                rejected += 1
+                continue
+            if len(chunk) >= STREAM_CHUNK_ROWS:
+                await store(device_id, chunk)
+                received += len(chunk)
+                chunk = []
+        if chunk:
+            await store(device_id, chunk)
+            received += len(chunk)
+        return JSONResponse(content={"status": "success", "rows_received": received, "rows_rejected": rejected})
+    except DecodeError as e:
+        return JSONResponse(status_code=400, content={"status": "error", "message": str(e), "rows_received": received})
+    except Exception as e:
+        return JSONResponse(status_code=500, content={"status": "error", "message": str(e), "rows_received": received})
+
+
 # ======================================================
 # Run the server
 # ======================================================
@@ -0,0 +1,220 @@
+import os
+import time
+import uuid
+import asyncio
+from collections import defaultdict
+from datetime import datetime
+from typing import List, Dict, Any, Optional
+
+import pandas as pd
+
+try:  # Columnar sinks are optional (pip install pyarrow)
+    import pyarrow as pa
+    import pyarrow.ipc as ipc
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = ipc = pq = None
+
+
+# ======================================================
+# Storage sinks (blocking; run off the event loop)
+# ======================================================
+
+class CsvSink:
+    """Appends to {device}_data_received.csv, same files the server always wrote."""
+
+    def __init__(self, data_dir: str):
+        self.data_dir = data_dir
+        self._has_header: Dict[str, bool] = {}  # Checked once per device instead of per request
+
+    def write(self, device: str, rows: List[Dict[str, Any]]):
+        filename = os.path.join(self.data_dir, f"{device}_data_received.csv")
+        if device not in self._has_header:
+            self._has_header[device] = os.path.isfile(filename)
+        pd.DataFrame(rows).to_csv(filename, mode="a", header=not self._has_header[device], index=False)
+        self._has_header[device] = True
+
+    def close(self):
+        pass
+
+
+class ColumnarSink:
+    """
+    Rolling Parquet (fmt="parquet") or Arrow IPC (fmt="arrow") files per device:
+    {data_dir}/{device}/{device}_{opened}_{run}_{seq}.{fmt}, where run is random
+    per sink so a restarted server (same second, seq back at 1) never reuses a name.
+    Each flush becomes a row group / record batch; a file is closed (and its
+    footer written, so readers can open it) once it reaches max_bytes or has
+    been open for max_age_s.
+    """
+
+    def __init__(self, data_dir: str, fmt: str = "parquet", max_bytes: int = 64 * 1024 * 1024,
+                 max_age_s: float = 300, compression: str = "zstd"):
+        if pa is None:
+            raise RuntimeError("ColumnarSink needs pyarrow (pip install pyarrow)")
+        if fmt not in ("parquet", "arrow"):
+            raise ValueError("fmt must be 'parquet' or 'arrow'")
+        self.data_dir = data_dir
+        self.fmt = fmt
+        self.max_bytes = max_bytes
+        self.max_age_s = max_age_s
+        self.compression = compression
+        self._files: Dict[str, Dict[str, Any]] = {}
+        self._seq = 0
+        self._run = uuid.uuid4().hex[:8]
+
+    def _open(self, device: str, schema):
+        device_dir = os.path.join(self.data_dir, device)
+        os.makedirs(device_dir, exist_ok=True)
+        self._seq += 1
+        name = f"{device}_{datetime.now():%Y%m%dT%H%M%S}_{self._run}_{self._seq:04d}.{self.fmt}"
+        path = os.path.join(device_dir, name)
+        if self.fmt == "parquet":
+            writer = pq.ParquetWriter(path, schema, compression=self.compression)
+        else:
+            writer = ipc.new_file(path, schema, options=ipc.IpcWriteOptions(compression=self.compression))
+        self._files[device] = {
+            "writer": writer,
+            "schema": schema,
+            "path": path,
+            "bytes": 0,
+            "opened": time.monotonic(),
+        }
+        return self._files[device]
+
+    def _rotate_if_needed(self, device: str):
+        f = self._files.get(device)
+        if f and (f["bytes"] >= self.max_bytes or time.monotonic() - f["opened"] >= self.max_age_s):
+            f["writer"].close()
+            del self._files[device]
+            print(f"[✓] Rotated {f['path']}")
+
+    def write(self, device: str, rows: List[Dict[str, Any]]):
+        self._rotate_if_needed(device)
+        f = self._files.get(device)
+        table = pa.Table.from_pylist(rows, schema=f["schema"] if f else None)
+        if f is None:
+            f = self._open(device, table.schema)
+        f["writer"].write_table(table)
+        f["bytes"] += table.nbytes
+
+    def rotate_expired(self):
+        for device in list(self._files):
+            self._rotate_if_needed(device)
+
+    def close(self):
+        for f in self._files.values():
+            f["writer"].close()
+        self._files.clear()
+
+
+def create_sink(kind: str, data_dir: str):
+    if kind in ("parquet", "arrow"):
+        return ColumnarSink(data_dir, fmt=kind,
+                            max_bytes=int(os.getenv("SINK_MAX_MB", 64)) * 1024 * 1024,
+                            max_age_s=float(os.getenv("SINK_MAX_AGE_S", 300)))
+    if kind == "csv":
+        return CsvSink(data_dir)
+    raise ValueError(f"Unknown sink: {kind}")
+
+
+# ======================================================
+# Async buffer in front of a sink
+# ======================================================
+
+_STOP = object()
+
+
+class BufferedSink:
+    """
+    Requests enqueue readings; one background task batches them per device
+    and hands each batch to the sink in a worker thread, so the event loop
+    never blocks on disk and a device file only ever has one writer.
+
+    ack="enqueue": submit() returns once the readings are queued.
+    ack="flush":   submit() returns once the batch holding them is written.
+    """
+
+    def __init__(self, sink, flush_rows: int = 5000, flush_interval_s: float = 1.0,
+                 queue_size: int = 1000, ack: str = "enqueue"):
+        if ack not in ("enqueue", "flush"):
+            raise ValueError("ack must be 'enqueue' or 'flush'")
+        self.sink = sink
+        self.flush_rows = flush_rows
+        self.flush_interval_s = flush_interval_s
+        self.ack = ack
+        self._queue: Optional[asyncio.Queue] = None
+        self._queue_size = queue_size
+        self._task: Optional[asyncio.Task] = None
+        self.rows_written = 0
+
+    async def start(self):
+        self._queue = asyncio.Queue(maxsize=self._queue_size)
+        self._task = asyncio.create_task(self._run())
+
+    async def submit(self, device: str, rows: List[Dict[str, Any]]):
+        waiter = asyncio.get_running_loop().create_future() if self.ack == "flush" else None
+        await self._queue.put((device, rows, waiter))  # Waits when full: backpressure instead of unbounded memory
+        if waiter is not None:
+            await waiter
+
+    async def close(self):
+        if self._task is None:
+            return
+        await self._queue.put(_STOP)
+        await self._task
+        await asyncio.to_thread(self.sink.close)
+        self._task = None
+
+    def _write_all(self, buffers: Dict[str, List[Dict[str, Any]]]):
+        for device, rows in buffers.items():
+            self.sink.write(device, rows)
+        if hasattr(self.sink, "rotate_expired"):
+            self.sink.rotate_expired()
+
+    async def _flush(self, buffers, waiters):
+        try:
+            if buffers:
+                await asyncio.to_thread(self._write_all, buffers)
+            self.rows_written += sum(len(rows) for rows in buffers.values())
+            for w in waiters:
+                if not w.done():
+                    w.set_result(True)
+        except Exception as e:
+            print(f"[✗] Sink flush failed: {e}")
+            for w in waiters:
+                if not w.done():
+                    w.set_exception(e)
+
+    async def _run(self):
+        buffers = defaultdict(list)
+        waiters = []
+        buffered = 0
+        deadline = None
+        stopping = False
+        while not stopping:
+            timeout = self.flush_interval_s if deadline is None else max(0.0, deadline - time.monotonic())
+            try:
+                item = await asyncio.wait_for(self._queue.get(), timeout)
+                if item is _STOP:
+                    stopping = True
+                else:
+                    device, rows, waiter = item
+                    if deadline is None:
+                        deadline = time.monotonic() + self.flush_interval_s
+                    buffers[device].extend(rows)
+                    buffered += len(rows)
+                    if waiter is not None:
+                        waiters.append(waiter)
+            except asyncio.TimeoutError:
+                pass
+
+            due = deadline is not None and time.monotonic() >= deadline
+            if stopping or buffered >= self.flush_rows or due:
+                await self._flush(dict(buffers), waiters)
+                buffers.clear()
+                waiters = []
+                buffered = 0
+                deadline = None
+            elif deadline is None and hasattr(self.sink, "rotate_expired"):
+                await asyncio.to_thread(self.sink.rotate_expired)  # Idle: still close aged files
@@ -0,0 +1,99 @@
+import json
+import zlib
+from typing import AsyncIterator, Any
+
+try:  # Faster line decoding when available
+    import orjson
+    _loads = orjson.loads
+except ImportError:
+    _loads = json.loads
+
+try:  # msgpack bodies are optional (pip install msgpack)
+    import msgpack
+except ImportError:
+    msgpack = None
+
+
+# ======================================================
+# Incremental decoding of streamed upload bodies
+# ======================================================
+
+NDJSON_TYPES = ("application/x-ndjson", "application/ndjson", "application/jsonl", "application/json-seq")
+MSGPACK_TYPES = ("application/msgpack", "application/x-msgpack")
+
+
+class DecodeError(ValueError):
+    """Raised for bodies that cannot be decoded at all (bad gzip, unsupported type)."""
+
+
+def body_format(content_type: str) -> str:
+    content_type = (content_type or "").split(";")[0].strip().lower()
+    if content_type in NDJSON_TYPES:
+        return "ndjson"
+    if content_type in MSGPACK_TYPES:
+        if msgpack is None:
+            raise DecodeError("msgpack bodies need the msgpack package (pip install msgpack)")
+        return "msgpack"
+    raise DecodeError(f"Unsupported content type: {content_type or '<none>'}")
+
+
+async def _gunzip(chunks: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+    """Decompress a gzip stream, including several concatenated gzip members."""
+    d = zlib.decompressobj(16 + zlib.MAX_WBITS)
+    try:
+        async for chunk in chunks:
+            while chunk:
+                out = d.decompress(chunk)
+                if out:
+                    yield out
+                chunk = b""
+                if d.eof:  # Next member starts in unused_data
+                    chunk = d.unused_data
+                    d = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        tail = d.flush()
+    except zlib.error as e:
+        raise DecodeError(f"Invalid gzip body: {e}")
+    if tail:
+        yield tail
+
+
+async def iter_records(chunks: AsyncIterator[bytes], fmt: str,
+                       content_encoding: str = "") -> AsyncIterator[Any]:
+    """
+    Yield one decoded record per NDJSON line / msgpack object (fmt from
+    body_format) as the body arrives, so memory stays at one network chunk
+    plus one partial record.
+    Records that fail to decode are yielded as DecodeError instances so the
+    caller can count them without aborting the upload.
+    """
+    if (content_encoding or "").strip().lower() in ("gzip", "x-gzip"):
+        chunks = _gunzip(chunks)
+
+    if fmt == "msgpack":
+        unpacker = msgpack.Unpacker(raw=False)
+        async for chunk in chunks:
+            unpacker.feed(chunk)
+            try:
+                objs = list(unpacker)
+            except ValueError as e:  # msgpack has no resync point, so a corrupt stream ends the upload
+                raise DecodeError(f"Invalid msgpack body: {e}")
+            for obj in objs:
+                yield obj
+        return
+
+    pending = b""
+    async for chunk in chunks:
+        pending += chunk
+        lines = pending.split(b"\n")
+        pending = lines.pop()  # Last piece may be an incomplete line
+        for line in lines:
+            if line.strip():
+                try:
+                    yield _loads(line)
+                except ValueError as e:
+                    yield DecodeError(str(e))
+    if pending.strip():
+        try:
+            yield _loads(pending)
+        except ValueError as e:
+            yield DecodeError(str(e))
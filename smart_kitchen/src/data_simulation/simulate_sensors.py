@@ -4,6 +4,7 @@ import os
 from datetime import datetime, timedelta
 import requests
 import json
+import gzip
 
 
 # ======================================================
@@ -53,7 +54,39 @@ def send_data_to_server(df, device_id, server_url="http://127.0.0.1:8000/upload_
         print(f"[→] Sent {len(df)} readings for {device_id}: {response.json()}")
     except requests.exceptions.RequestException as e:
         print(f"[✗] Failed to send data for {device_id}: {e}")
-    
+
+
+def iter_ndjson(df, chunk_rows=5000, compress=True):
+    """Yield the readings as NDJSON (optionally gzip) bytes, chunk_rows at a time."""
+    compressor = gzip.compress if compress else None
+    for start in range(0, len(df), chunk_rows):
+        part = df.iloc[start:start + chunk_rows].copy()
+        # Column-wise: DataFrame.applymap is gone in pandas 3
+        for col in part.select_dtypes(include=["datetime", "datetimetz"]).columns:
+            part[col] = part[col].map(pd.Timestamp.isoformat, na_action="ignore")
+        data = part.to_json(orient="records", lines=True).encode("utf-8")
+        if not data.endswith(b"\n"):
+            data += b"\n"
+        # Concatenated gzip members form a valid gzip stream
+        yield compressor(data) if compressor else data
+
+
+def stream_data_to_server(df, device_id, server_url="http://127.0.0.1:8000/upload_stream", compress=True):
+    """
+    Stream readings to /upload_stream/{device_id} as chunked NDJSON, so neither
+    side holds the whole upload in memory (use for large backfills).
+    """
+    headers = {"Content-Type": "application/x-ndjson"}
+    if compress:
+        headers["Content-Encoding"] = "gzip"
+    try:
+        response = requests.post(f"{server_url}/{device_id}", data=iter_ndjson(df, compress=compress),
+                                 headers=headers, timeout=300)
+        response.raise_for_status()
+        print(f"[→] Streamed {len(df)} readings for {device_id}: {response.json()}")
+    except requests.exceptions.RequestException as e:
+        print(f"[✗] Failed to stream data for {device_id}: {e}")
+
 
 def generate_normal_data(n_samples, base, noise_std):
     """Generate normally distributed sensor values."""
@@ -106,12 +139,15 @@ def save_data(df, device_name, out_dir="../../data/raw/"):
     print(f"[✓] Saved simulated data for {device_name} → {filename}")
 
 
-def simulate_all_devices(n_samples=1440):
+def simulate_all_devices(n_samples=1440, stream=False):
     """Simulate and save data for all defined devices."""
     for device in DEVICES.keys():
         df = simulate_device(device, n_samples)
         save_data(df, device)
-        send_data_to_server(df, device)
+        if stream:
+            stream_data_to_server(df, device)
+        else:
+            send_data_to_server(df, device)
 
 
 # ======================================================
@@ -119,6 +155,11 @@ def simulate_all_devices(n_samples=1440):
 # ======================================================
 
 if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--samples", type=int, default=1440, help="Readings per device (1440 = 1 day at 1-minute frequency)")
+    parser.add_argument("--stream", action="store_true", help="Upload through the streaming NDJSON endpoint")
+    args = parser.parse_args()
     print("🔧 Simulating Smart Kitchen IoT data...")
-    simulate_all_devices(n_samples=1440)  # 1-day data (1-minute frequency)
+    simulate_all_devices(n_samples=args.samples, stream=args.stream)
     print("✅ Simulation complete.")
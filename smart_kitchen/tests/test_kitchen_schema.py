@@ -0,0 +1,65 @@
+# smart_kitchen/tests/test_kitchen_schema.py
+import os
+import sqlite3
+import importlib.util
+
+# Loaded by path: the kitchen and smart home pipelines both have a schema.py
+_spec = importlib.util.spec_from_file_location(
+    'kitchen_schema', os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'data_pipeline', 'schema.py'))
+schema = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(schema)
+SCHEMA_VERSION, migrate, to_epoch_ms = schema.SCHEMA_VERSION, schema.migrate, schema.to_epoch_ms
+
+# Kitchen sensor_data before v1: fixed sensor columns, no tenant_id/ts
+LEGACY_DDL = """
+    CREATE TABLE sensor_data (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        timestamp TEXT,
+        device TEXT,
+        temperature_C REAL,
+        CO_ppm REAL,
+        CO2_ppm REAL,
+        power_W REAL
+    )
+"""
+
+
+def _legacy_db(timestamps):
+    conn = sqlite3.connect(':memory:')
+    conn.execute(LEGACY_DDL)
+    conn.executemany("INSERT INTO sensor_data (timestamp, device, power_W) VALUES (?, 'oven', 1500)",
+                     [(t,) for t in timestamps])
+    conn.commit()
+    return conn
+
+
+def test_backfill_skips_unparseable_timestamps():
+    good = ['2024-05-01T12:00:00', '2024-05-01T12:00:05']
+    # More bad rows than batch_size: the old NULL-scanning loop never finished on these
+    conn = _legacy_db(['not a timestamp'] * 25 + good + [None, ''] + ['31/12/2024'] * 10)
+    migrate(conn, batch_size=4)
+
+    assert conn.execute("PRAGMA user_version").fetchone()[0] == SCHEMA_VERSION
+    rows = dict(conn.execute("SELECT timestamp, ts FROM sensor_data WHERE ts IS NOT NULL").fetchall())
+    assert rows == {t: to_epoch_ms(t) for t in good}
+    assert conn.execute("SELECT COUNT(*) FROM sensor_data WHERE ts IS NULL").fetchone()[0] == 37
+    assert conn.execute("SELECT COUNT(*) FROM sensor_data WHERE tenant_id IS NULL").fetchone()[0] == 0
+
+
+def test_ts_trigger_fills_ts_for_timestamp_only_writers():
+    conn = _legacy_db([])
+    migrate(conn)
+    conn.execute("INSERT INTO sensor_data (timestamp, device, power_W) VALUES ('2024-05-01T12:00:00.250', 'oven', 1)")
+    conn.execute("INSERT INTO sensor_data (timestamp, device, ts) VALUES ('2024-05-01T12:00:00', 'oven', 7)")
+    conn.execute("INSERT INTO sensor_data (timestamp, device) VALUES ('garbage', 'oven')")
+    assert [r[0] for r in conn.execute("SELECT ts FROM sensor_data ORDER BY id")] == [
+        to_epoch_ms('2024-05-01T12:00:00.250'), 7, None]
+
+
+def test_migrate_is_idempotent():
+    conn = _legacy_db(['2024-05-01T12:00:00', 'garbage'])
+    migrate(conn, batch_size=1)
+    migrate(conn, batch_size=1)
+    assert conn.execute("SELECT COUNT(*) FROM sensor_data WHERE ts IS NOT NULL").fetchone()[0] == 1
+    tables = {r[0] for r in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    assert {'sensor_rollup_1m', 'sensor_rollup_1h', 'pipeline_state'} <= tables
@@ -0,0 +1,37 @@
+# smart_kitchen/tests/test_simulate_sensors.py
+import os
+import sys
+import gzip
+import json
+
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src', 'data_simulation'))
+from simulate_sensors import iter_ndjson
+
+
+def _readings(n):
+    return pd.DataFrame({
+        'timestamp': pd.date_range('2024-05-01 12:00:00', periods=n, freq='1min'),
+        'temperature': [4.0 + i for i in range(n)],
+        'device': 'refrigerator',
+    })
+
+
+def test_iter_ndjson_writes_iso_timestamps_per_chunk():
+    chunks = list(iter_ndjson(_readings(5), chunk_rows=2, compress=False))
+    assert len(chunks) == 3
+    assert all(c.endswith(b'\n') for c in chunks)
+    records = [json.loads(line) for line in b''.join(chunks).splitlines()]
+    assert [r['timestamp'] for r in records] == [f'2024-05-01T12:0{i}:00' for i in range(5)]
+    assert records[4]['temperature'] == 8.0
+
+
+def test_iter_ndjson_gzip_members_form_one_stream():
+    df = _readings(7)
+    df.loc[3, 'timestamp'] = pd.NaT
+    body = gzip.decompress(b''.join(iter_ndjson(df, chunk_rows=3)))
+    records = [json.loads(line) for line in body.splitlines()]
+    assert len(records) == 7
+    assert records[3]['timestamp'] is None
+    assert records[6]['timestamp'] == '2024-05-01T12:06:00'